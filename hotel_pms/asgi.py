@@ -2,6 +2,9 @@
 ASGI config for hotel_pms project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serving through it (e.g. ``uvicorn hotel_pms.asgi:application``) enables the
+server-sent booking change stream at /timeline/events/; under WSGI the
+timeline falls back to long-polling /timeline/events/poll/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -28,6 +28,14 @@ app.conf.beat_schedule = {
         'task': 'rooms.tasks.backup_system_health_check',
         'schedule': 86400.0,  # 86400 seconds = 24 hours
     },
+    'compact-activity-log-daily': {
+        'task': 'rooms.tasks.compact_activity_log',
+        'schedule': 86400.0,  # 86400 seconds = 24 hours
+    },
+    'fail-stale-background-jobs': {
+        'task': 'rooms.tasks.fail_stale_background_jobs',
+        'schedule': 600.0,  # 600 seconds = 10 minutes
+    },
 }
 
 app.conf.timezone = 'Asia/Manila'
\ No newline at end of file
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config
 import dj_database_url
 
@@ -29,6 +30,10 @@ SECRET_KEY = config('SECRET_KEY', default='django-insecure-6^)i)k=*-1!jz5$1cj#l1
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=False, cast=bool)
 
+# Running the test suite: work that would normally happen in background
+# threads is done inline or skipped, so it can't outlive a test's database
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1,hotel-snow-pms-docker.onrender.com', cast=lambda v: [s.strip() for s in v.split(',')])
 
 # CSRF Settings for production
@@ -187,6 +192,95 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Seconds between automatic backups, however they are triggered (Celery
+# beat, rooms.backup_middleware.RequestBasedBackupTrigger, ...)
+AUTO_BACKUP_INTERVAL = config('AUTO_BACKUP_INTERVAL', default=600, cast=int)
+# Off under tests: a backup thread started by a test request would outlive
+# the test's database
+AUTO_BACKUP_TRIGGER_ENABLED = config('AUTO_BACKUP_TRIGGER_ENABLED', default=not TESTING, cast=bool)
+# Automatic backups take a full snapshot this often and differential
+# backups (changed and deleted bookings only) in between
+BACKUP_FULL_INTERVAL_HOURS = config('BACKUP_FULL_INTERVAL_HOURS', default=24, cast=int)
+
+# Retention of automatic backups, youngest tier first: (max age in hours,
+# keep one backup per None = every backup / 'hour' / 'day' / 'week' / 'month').
+# Older backups are deleted; manual backups and imports are never removed.
+BACKUP_RETENTION_TIERS = [
+    (24, None),
+    (24 * 7, 'hour'),
+    (24 * 90, 'day'),
+]
+BACKUP_RETENTION_BATCH_SIZE = 200  # rows deleted per transaction
+
+# Where backup files are kept: in the database by default, or on any Django
+# storage backend (see rooms.backup_storage). Only point this at durable
+# storage (a persistent disk or an object storage backend): files written
+# to an ephemeral filesystem are lost on the next deploy.
+BACKUP_STORAGE_BACKEND = config('BACKUP_STORAGE_BACKEND', default='')
+BACKUP_STORAGE_ROOT = config('BACKUP_STORAGE_ROOT', default='')
+BACKUP_STORAGE = None
+if BACKUP_STORAGE_BACKEND or BACKUP_STORAGE_ROOT:
+    BACKUP_STORAGE = {
+        'BACKEND': BACKUP_STORAGE_BACKEND or 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': BACKUP_STORAGE_ROOT} if BACKUP_STORAGE_ROOT else {},
+    }
+
+# Excel imports and exports run as background jobs: 'thread' runs them in
+# thread pools of the web process (no Redis needed), 'celery' queues them
+# for the workers. Imports and exports get BACKGROUND_JOB_WORKERS threads
+# each, so a long import never queues an export behind it.
+BACKGROUND_JOB_EXECUTOR = config('BACKGROUND_JOB_EXECUTOR', default='thread')
+BACKGROUND_JOB_WORKERS = config('BACKGROUND_JOB_WORKERS', default=1, cast=int)
+# A running job that reported no progress for this long, or a pending one
+# nobody started, is marked failed (its worker died or was restarted)
+BACKGROUND_JOB_STALE_SECONDS = config('BACKGROUND_JOB_STALE_SECONDS', default=900, cast=int)
+
+# Availability index: seconds before a room's cached bookings are reloaded,
+# so writes from other worker processes are picked up
+AVAILABILITY_INDEX_TTL = config('AVAILABILITY_INDEX_TTL', default=60, cast=int)
+
+# Booking change feed pushed to open timelines. The in-process backend only
+# reaches clients of the same worker; the ETag poll covers the rest.
+CHANGE_FEED_BACKEND = config('CHANGE_FEED_BACKEND', default='rooms.change_feed.InProcessBroadcaster')
+CHANGE_FEED_BUFFER_SIZE = 500
+CHANGE_FEED_KEEPALIVE = 15  # seconds between SSE keepalive comments
+# Seconds a WSGI long-poll may hold a worker; keep at 0 with few sync workers
+CHANGE_FEED_POLL_WAIT = config('CHANGE_FEED_POLL_WAIT', default=0, cast=int)
+
+# Incremental booking sync holds back rows changed within this many seconds
+# so transactions still in flight can't be skipped by a client's cursor
+CHANGES_SETTLE_SECONDS = config('CHANGES_SETTLE_SECONDS', default=5, cast=int)
+
+# Request activity log: entries are queued in memory and bulk-inserted by a
+# background thread, and what is left is written when the process exits.
+# ACTIVITY_LOG_SYNC writes each entry immediately (the default under tests).
+ACTIVITY_LOG_SYNC = config('ACTIVITY_LOG_SYNC', default=TESTING, cast=bool)
+ACTIVITY_LOG_BATCH_SIZE = config('ACTIVITY_LOG_BATCH_SIZE', default=100, cast=int)
+ACTIVITY_LOG_FLUSH_INTERVAL = config('ACTIVITY_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+ACTIVITY_LOG_QUEUE_SIZE = 10000  # entries beyond this are dropped, not blocked on
+# Which requests are logged: longest matching path prefix wins, with action
+# 'always', 'never' or N (log one request in N). Requests no rule matches are
+# logged when their method is mutating, otherwise per ACTIVITY_LOG_DEFAULT.
+ACTIVITY_LOG_RULES = [
+    ('/admin', 'never'),
+    ('/static', 'never'),
+    ('/health/', 'never'),             # monitor probes
+    ('/timeline/data/', 'never'),      # auto-refresh version checks
+    ('/timeline/events/', 'never'),    # change feed
+    ('/bookings/changes/', 'never'),   # incremental sync polling
+    ('/import-jobs/', 'never'),        # import progress polling
+    ('/export-jobs/', 'never'),        # export progress polling
+    ('/timeline/rows/', 20),           # virtualized timeline chunks
+    ('/check-availability/', 20),      # booking form availability checks (POST)
+    ('/search-availability/', 20),     # free room search (POST)
+]
+ACTIVITY_LOG_DEFAULT = 'always'
+ACTIVITY_LOG_ALWAYS_METHODS = ['POST', 'PUT', 'PATCH', 'DELETE']
+# Raw entries older than this many days are rolled into daily summaries by
+# the compact_activity_log task, then deleted this many rows per transaction
+ACTIVITY_LOG_RETENTION_DAYS = config('ACTIVITY_LOG_RETENTION_DAYS', default=30, cast=int)
+ACTIVITY_LOG_COMPACTION_BATCH_SIZE = 5000
+
 # Logging configuration
 LOGGING = {
     'version': 1,
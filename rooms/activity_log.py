@@ -0,0 +1,366 @@
+import atexit
+import base64
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models import Q, Count, Min, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import ActivityLog, ActivityLogSummary
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_LOG_PAGE_SIZE = 25
+
+
+class ActivityLogBuffer:
+    """
+    Bounded in-process queue of ActivityLog entries, written with bulk_create
+    by a background flusher thread once ACTIVITY_LOG_BATCH_SIZE entries are
+    waiting or ACTIVITY_LOG_FLUSH_INTERVAL seconds have passed. Whatever is
+    still queued is flushed when the process exits.
+
+    When the queue is full new entries are dropped (and counted) rather than
+    blocking the request.
+    """
+
+    def __init__(self, max_size=None, batch_size=None, flush_interval=None):
+        self.max_size = max_size or getattr(settings, 'ACTIVITY_LOG_QUEUE_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2.0)
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, entry):
+        """Queue an unsaved ActivityLog instance"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Activity log queue full, {self.dropped} entries dropped so far")
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every queued entry, one bulk_create per batch; returns the number written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                try:
+                    ActivityLog.objects.bulk_create(batch)
+                    written += len(batch)
+                except Exception as e:
+                    logger.error(f"Error writing {len(batch)} activity log entries: {str(e)}")
+
+    def stop(self):
+        """Stop the flusher and write what is left; registered with atexit"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _ensure_started(self):
+        # Started lazily and per process: a thread started before a
+        # pre-forking server forks would not exist in the workers
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is None:
+                atexit.register(self.stop)
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_activity_log_buffer():
+    """Return the process-wide activity log buffer"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityLogBuffer()
+    return _buffer
+
+
+def record_activity(**fields):
+    """
+    Log an activity. Buffered by default; with ACTIVITY_LOG_SYNC (tests,
+    management commands that need the row immediately) it is written at once.
+    """
+    # timestamp defaults to now, so buffered entries keep their request time
+    entry = ActivityLog(**fields)
+    if getattr(settings, 'ACTIVITY_LOG_SYNC', False):
+        entry.save()
+    else:
+        get_activity_log_buffer().add(entry)
+    return entry
+
+
+
+class ActivityLogPolicy:
+    """
+    Decides which requests are written to the activity log.
+
+    Rules are (path prefix, action) pairs where action is 'always', 'never'
+    or an integer N meaning one request in N is logged. The longest matching
+    prefix wins. Unmatched paths use the default action, except requests
+    with a method in always_methods, which are always logged; a matching
+    rule takes precedence over the method.
+
+    The prefixes are compiled into one regex, so a check is a single match.
+    """
+
+    def __init__(self, rules, default='always', always_methods=()):
+        self.always_methods = frozenset(method.upper() for method in always_methods)
+        self.default = self._compile_action(default)
+        rules = sorted(rules, key=lambda rule: len(rule[0]), reverse=True)
+        self.actions = [self._compile_action(action) for _, action in rules]
+        self.pattern = re.compile(
+            '|'.join(f'({re.escape(prefix)})' for prefix, _ in rules)
+        ) if rules else None
+
+    @staticmethod
+    def _compile_action(action):
+        if action in ('always', 'never'):
+            return action
+        if isinstance(action, int) and action >= 1:
+            # Shared counter: every Nth matching request is logged
+            return (action, itertools.count())
+        raise ImproperlyConfigured(f"Invalid activity log rule action: {action!r}")
+
+    def should_log(self, path, method):
+        match = self.pattern.match(path) if self.pattern else None
+        if match:
+            action = self.actions[match.lastindex - 1]
+        elif method in self.always_methods:
+            return True
+        else:
+            action = self.default
+
+        if action in ('always', 'never'):
+            return action == 'always'
+        every, counter = action
+        return next(counter) % every == 0
+
+
+_policy = None
+
+
+def get_activity_log_policy():
+    """Return the policy built from the ACTIVITY_LOG_* settings"""
+    global _policy
+    if _policy is None:
+        _policy = ActivityLogPolicy(
+            getattr(settings, 'ACTIVITY_LOG_RULES', [('/admin', 'never'), ('/static', 'never')]),
+            default=getattr(settings, 'ACTIVITY_LOG_DEFAULT', 'always'),
+            always_methods=getattr(settings, 'ACTIVITY_LOG_ALWAYS_METHODS', ['POST', 'PUT', 'PATCH', 'DELETE']),
+        )
+    return _policy
+
+
+def _reset_policy(setting, **kwargs):
+    global _policy
+    if setting.startswith('ACTIVITY_LOG_'):
+        _policy = None
+
+
+setting_changed.connect(_reset_policy)
+
+
+def _parse_bound(value, end_of_day=False):
+    """Parse a datetime-local or date filter value as an aware datetime"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_activity_logs(params):
+    """
+    Activity logs narrowed by the browser's filters: user id, method, path
+    prefix and a date_from/date_to range. Each filter is a condition an
+    index can serve: (user, timestamp), (method, timestamp), the path
+    prefix index and (timestamp, id).
+    Invalid filter values raise ValueError.
+    """
+    logs = ActivityLog.objects.select_related('user')
+
+    if params.get('user'):
+        if params['user'] == 'anonymous':
+            logs = logs.filter(user__isnull=True)
+        else:
+            logs = logs.filter(user_id=int(params['user']))
+    if params.get('method'):
+        logs = logs.filter(method=params['method'].upper())
+    if params.get('path'):
+        logs = logs.filter(path__startswith=params['path'])
+
+    date_from = _parse_bound(params.get('date_from'))
+    date_to = _parse_bound(params.get('date_to'), end_of_day=True)
+    if date_from:
+        logs = logs.filter(timestamp__gte=date_from)
+    if date_to:
+        logs = logs.filter(timestamp__lte=date_to)
+    return logs
+
+
+def encode_log_cursor(log):
+    return base64.urlsafe_b64encode(json.dumps([log.timestamp.isoformat(), log.id]).encode()).decode()
+
+
+def decode_log_cursor(cursor):
+    """Return (timestamp, id) from a page cursor"""
+    try:
+        timestamp, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return parse_datetime(timestamp), int(log_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid activity log cursor')
+
+
+def page_activity_logs(logs, before=None, after=None, limit=ACTIVITY_LOG_PAGE_SIZE):
+    """
+    One newest-first page of logs, keyset-paginated on (timestamp, id):
+    `before` pages to older entries, `after` back to newer ones. No COUNT
+    and no OFFSET, so a deep page costs the same as the first.
+    """
+    if after:
+        timestamp, log_id = decode_log_cursor(after)
+        page = list(logs.filter(
+            Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=log_id)
+        ).order_by('timestamp', 'id')[:limit + 1])
+        has_newer = len(page) > limit
+        page = page[:limit][::-1]
+        has_older = True
+    else:
+        if before:
+            timestamp, log_id = decode_log_cursor(before)
+            logs = logs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=log_id))
+        page = list(logs.order_by('-timestamp', '-id')[:limit + 1])
+        has_older = len(page) > limit
+        page = page[:limit]
+        has_newer = bool(before)
+
+    return {
+        'logs': page,
+        'newer_cursor': encode_log_cursor(page[0]) if page and has_newer else None,
+        'older_cursor': encode_log_cursor(page[-1]) if page and has_older else None,
+    }
+
+
+def compact_activity_logs(retention_days=None, batch_size=None):
+    """
+    Roll raw activity logs older than retention_days (whole local days) into
+    ActivityLogSummary rows, one per day, user, path and method, and delete
+    the raw rows.
+
+    Works through the old rows oldest first in batches of batch_size: each
+    batch is summarised and deleted in its own short transaction, so locks
+    stay brief and an interrupted run neither loses nor double-counts rows.
+    Returns (rows compacted, batches).
+    """
+    retention_days = retention_days or getattr(settings, 'ACTIVITY_LOG_RETENTION_DAYS', 30)
+    batch_size = batch_size or getattr(settings, 'ACTIVITY_LOG_COMPACTION_BATCH_SIZE', 5000)
+
+    today = timezone.localdate()
+    cutoff = timezone.make_aware(datetime.combine(today - timedelta(days=retention_days), time.min))
+    old_logs = ActivityLog.objects.filter(timestamp__lt=cutoff)
+
+    compacted = batches = 0
+    while True:
+        with transaction.atomic():
+            ids = list(old_logs.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            _merge_into_summaries(ActivityLog.objects.filter(id__in=ids))
+            # No signals or relations point at ActivityLog: a single DELETE
+            ActivityLog.objects.filter(id__in=ids).delete()
+        compacted += len(ids)
+        batches += 1
+
+    return compacted, batches
+
+
+def _merge_into_summaries(logs):
+    groups = list(
+        logs.annotate(date=TruncDate('timestamp'))
+        .values('date', 'user_id', 'path', 'method')
+        .annotate(count=Count('id'), first_seen=Min('timestamp'), last_seen=Max('timestamp'))
+        .order_by()
+    )
+
+    def group_key(row):
+        return (row['date'], row['user_id'], row['path'], row['method'])
+
+    existing = {
+        (summary.date, summary.user_id, summary.path, summary.method): summary
+        for summary in ActivityLogSummary.objects.select_for_update().filter(
+            date__in={row['date'] for row in groups}
+        )
+    }
+
+    created, updated = [], []
+    for row in groups:
+        summary = existing.get(group_key(row))
+        if summary is None:
+            created.append(ActivityLogSummary(
+                date=row['date'], user_id=row['user_id'], path=row['path'], method=row['method'],
+                count=row['count'], first_seen=row['first_seen'], last_seen=row['last_seen'],
+            ))
+        else:
+            summary.count += row['count']
+            summary.first_seen = min(summary.first_seen, row['first_seen'])
+            summary.last_seen = max(summary.last_seen, row['last_seen'])
+            updated.append(summary)
+
+    ActivityLogSummary.objects.bulk_create(created)
+    ActivityLogSummary.objects.bulk_update(updated, ['count', 'first_seen', 'last_seen'])
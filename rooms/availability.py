@@ -0,0 +1,205 @@
+import bisect
+import threading
+import time
+import logging
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from .models import Booking, Room
+
+logger = logging.getLogger(__name__)
+
+
+class BookingInterval(namedtuple('BookingInterval', [
+        'check_in_date', 'check_out_date', 'id', 'guest_name', 'status'])):
+    """
+    Lightweight, immutable view of an active booking held in the index.
+    Mirrors the Booking attributes the availability views read so it can be
+    used in place of a model instance.
+    """
+    __slots__ = ()
+
+    def get_status_display(self):
+        return dict(Booking.STATUS_CHOICES).get(self.status, self.status)
+
+
+class _RoomIntervals:
+    """Active bookings of one room, kept sorted by check-in date"""
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals)
+        self.starts = [interval.check_in_date for interval in self.intervals]
+        self.max_nights = max((self._nights(i) for i in self.intervals), default=0)
+        self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _nights(interval):
+        return (interval.check_out_date - interval.check_in_date).days
+
+    def add(self, interval):
+        position = bisect.bisect_left(self.intervals, interval)
+        self.intervals.insert(position, interval)
+        self.starts.insert(position, interval.check_in_date)
+        self.max_nights = max(self.max_nights, self._nights(interval))
+
+    def remove(self, interval):
+        position = bisect.bisect_left(self.intervals, interval)
+        if position < len(self.intervals) and self.intervals[position] == interval:
+            del self.intervals[position]
+            del self.starts[position]
+
+    def overlapping(self, check_in_date, check_out_date):
+        """
+        Return intervals where (check_in < existing_check_out) AND
+        (check_out > existing_check_in).
+
+        Only bookings starting inside [check_in - longest stay, check_out) can
+        overlap, so both ends of the scan are found by bisection.
+        """
+        lowest_start = check_in_date - timedelta(days=self.max_nights)
+        lo = bisect.bisect_right(self.starts, lowest_start)
+        hi = bisect.bisect_left(self.starts, check_out_date)
+        return [
+            interval for interval in self.intervals[lo:hi]
+            if interval.check_out_date > check_in_date
+        ]
+
+
+class AvailabilityIndex:
+    """
+    In-process interval index of active bookings per room.
+
+    Each room's bookings are loaded from the database on first use and then
+    kept current by the Booking save/delete signals (see rooms.signals), so
+    repeated availability checks are answered from memory in O(log n).
+    Writes made by other worker processes are picked up when a room's entry
+    expires after AVAILABILITY_INDEX_TTL seconds.
+    """
+
+    def __init__(self):
+        self._rooms = {}
+        self._booking_rooms = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AVAILABILITY_INDEX_TTL', 60)
+
+    def find_conflicts(self, room_id, check_in_date, check_out_date, exclude_booking_id=None):
+        """
+        Return the active bookings of a room overlapping the given date range,
+        as BookingInterval tuples ordered by check-in date.
+        """
+        room_intervals = self._get_room(room_id)
+        with self._lock:
+            conflicts = room_intervals.overlapping(check_in_date, check_out_date)
+
+        if exclude_booking_id:
+            conflicts = [c for c in conflicts if c.id != int(exclude_booking_id)]
+        return conflicts
+
+    def update_booking(self, booking):
+        """Re-index a booking after it was created or changed"""
+        with self._lock:
+            self._discard(booking.id)
+            room_intervals = self._rooms.get(booking.room_id)
+            if room_intervals is None or booking.status not in Booking.ACTIVE_STATUSES:
+                return
+
+            interval = self._to_interval(booking)
+            room_intervals.add(interval)
+            self._booking_rooms[booking.id] = (booking.room_id, interval)
+
+    def remove_booking(self, booking_id):
+        """Drop a deleted booking from the index"""
+        with self._lock:
+            self._discard(booking_id)
+
+    def invalidate(self, room_id=None):
+        """Forget one room's bookings, or the whole index"""
+        with self._lock:
+            if room_id is None:
+                self._rooms.clear()
+                self._booking_rooms.clear()
+            else:
+                self._forget_room(int(room_id))
+
+    def _discard(self, booking_id):
+        entry = self._booking_rooms.pop(booking_id, None)
+        if entry is None:
+            return
+        room_id, interval = entry
+        room_intervals = self._rooms.get(room_id)
+        if room_intervals:
+            room_intervals.remove(interval)
+
+    def _get_room(self, room_id):
+        room_id = int(room_id)
+        with self._lock:
+            room_intervals = self._rooms.get(room_id)
+            if room_intervals and time.monotonic() - room_intervals.loaded_at < self.ttl:
+                return room_intervals
+
+        # Load outside the lock so a slow query doesn't block other rooms
+        bookings = Booking.objects.filter(
+            room_id=room_id,
+            status__in=Booking.ACTIVE_STATUSES
+        ).values_list('check_in_date', 'check_out_date', 'id', 'guest_name', 'status')
+        room_intervals = _RoomIntervals(BookingInterval(*row) for row in bookings)
+
+        with self._lock:
+            self._forget_room(room_id)
+            self._rooms[room_id] = room_intervals
+            for interval in room_intervals.intervals:
+                self._booking_rooms[interval.id] = (room_id, interval)
+
+        logger.debug(f"Loaded availability index for room {room_id}: {len(room_intervals.intervals)} bookings")
+        return room_intervals
+
+    def _forget_room(self, room_id):
+        room_intervals = self._rooms.pop(room_id, None)
+        if room_intervals:
+            for interval in room_intervals.intervals:
+                self._booking_rooms.pop(interval.id, None)
+
+    @staticmethod
+    def _to_interval(booking):
+        return BookingInterval(
+            booking.check_in_date,
+            booking.check_out_date,
+            booking.id,
+            booking.guest_name,
+            booking.status,
+        )
+
+
+# Global index instance shared by the views of this worker process
+availability_index = AvailabilityIndex()
+
+
+def find_conflicting_bookings(room, check_in_date, check_out_date, exclude_booking_id=None):
+    """Index-backed equivalent of Booking.check_room_availability"""
+    room_id = room.id if hasattr(room, 'id') else room
+    return availability_index.find_conflicts(room_id, check_in_date, check_out_date, exclude_booking_id)
+
+
+def find_available_rooms(check_in_date, check_out_date, room_type=None):
+    """
+    Return every active room with no active booking overlapping the date range.
+
+    Runs as a single query: rooms are anti-joined against overlapping bookings
+    with NOT EXISTS instead of checking each room separately.
+    """
+    overlapping_bookings = Booking.objects.filter(
+        room=OuterRef('pk'),
+        status__in=Booking.ACTIVE_STATUSES,
+        check_in_date__lt=check_out_date,
+        check_out_date__gt=check_in_date
+    )
+
+    rooms = Room.objects.filter(is_active=True).filter(~Exists(overlapping_bookings))
+    if room_type:
+        rooms = rooms.filter(room_type=room_type)
+
+    return rooms.select_related('room_type').order_by('room_number')
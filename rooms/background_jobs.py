@@ -0,0 +1,78 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def dispatch_job(task_name, *args):
+    """
+    Run a task from rooms.tasks in the background: queued on Celery when
+    BACKGROUND_JOB_EXECUTOR is 'celery' and Celery is installed, otherwise
+    in this process's thread pool for that task
+    """
+    from . import tasks
+    task = getattr(tasks, task_name)
+    # Without Celery, shared_task leaves a plain function
+    if getattr(settings, 'BACKGROUND_JOB_EXECUTOR', 'thread') == 'celery' and hasattr(task, 'delay'):
+        task.delay(*args)
+    else:
+        get_job_executor(task_name).submit(_run_in_thread, task, *args)
+
+
+def _run_in_thread(task, *args):
+    try:
+        task(*args)
+    except Exception as e:
+        logger.error(f"Error running background job {getattr(task, '__name__', task)}{args}: {str(e)}")
+    finally:
+        # Threads don't go through the request cycle that closes connections
+        connection.close()
+
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def get_job_executor(task_name):
+    """
+    Thread pool running one kind of background job in this process when
+    Celery isn't used. Each task gets its own BACKGROUND_JOB_WORKERS
+    threads, so a long import doesn't hold up exports.
+    """
+    executor = _executors.get(task_name)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(task_name)
+            if executor is None:
+                executor = _executors[task_name] = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_JOB_WORKERS', 1),
+                    thread_name_prefix=task_name
+                )
+    return executor
+
+
+def fail_stale_jobs(jobs, message):
+    """
+    Mark jobs whose worker is gone as FAILED: running ones without a
+    heartbeat for BACKGROUND_JOB_STALE_SECONDS, and pending ones nobody
+    picked up in that time (e.g. queued in a thread pool of a process that
+    was restarted). Returns the ids of the jobs marked failed.
+    """
+    now = timezone.now()
+    cutoff = now - timezone.timedelta(seconds=getattr(settings, 'BACKGROUND_JOB_STALE_SECONDS', 900))
+    stale = jobs.filter(
+        Q(status='RUNNING', heartbeat_at__lt=cutoff) | Q(status='PENDING', created_at__lt=cutoff)
+    )
+    stale_ids = list(stale.values_list('id', flat=True))
+    if not stale_ids:
+        return []
+    # Still stale at update time: a job that reported meanwhile is left alone
+    stale.filter(id__in=stale_ids).update(status='FAILED', message=message, finished_at=now)
+    failed_ids = list(jobs.filter(id__in=stale_ids, status='FAILED', finished_at=now).values_list('id', flat=True))
+    logger.warning(f"Marked stale {jobs.model.__name__} jobs {failed_ids} as failed")
+    return failed_ids
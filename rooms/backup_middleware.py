@@ -1,7 +1,10 @@
 from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.core.management import call_command
-from rooms.models import DataBackup
+from django.db import connection
+from rooms.backup_scheduler import claim_due_backup, reschedule_backup
 import logging
 import threading
 
@@ -13,7 +16,12 @@ class AutoBackupMiddleware(MiddlewareMixin):
     This is a fallback when Celery/Redis is not available
     """
     
+    # Retry delay after a failed backup
+    RETRY_SECONDS = 60
+    
     def __init__(self, get_response):
+        if not settings.AUTO_BACKUP_TRIGGER_ENABLED:
+            raise MiddlewareNotUsed
         self.get_response = get_response
         self._last_check = None
         self._backup_lock = threading.Lock()
@@ -38,8 +46,8 @@ class AutoBackupMiddleware(MiddlewareMixin):
                 return
                 
             try:
-                # Check if we need a backup
-                if self._should_create_backup():
+                # Claim the run if it's due on the shared schedule
+                if self._claim_due_backup():
                     # Create backup in background thread
                     thread = threading.Thread(target=self._create_backup_async, daemon=True)
                     thread.start()
@@ -50,20 +58,11 @@ class AutoBackupMiddleware(MiddlewareMixin):
         except Exception as e:
             logger.error(f"Error in backup middleware: {str(e)}")
 
-    def _should_create_backup(self):
-        """Check if we should create a backup now"""
+    def _claim_due_backup(self):
+        """Claim the next run on the shared schedule, if it is due"""
         try:
-            # Get the last automatic backup
-            last_backup = DataBackup.objects.filter(
-                backup_type='AUTO'
-            ).order_by('-created_at').first()
-            
-            if not last_backup:
-                return True
-                
-            # Check if last backup was more than 10 minutes ago
-            time_since_last = timezone.now() - last_backup.created_at
-            return time_since_last.total_seconds() >= (10 * 60)  # 10 minutes
+            claimed, _ = claim_due_backup()
+            return claimed
             
         except Exception as e:
             logger.error(f"Error checking backup schedule in middleware: {str(e)}")
@@ -73,54 +72,72 @@ class AutoBackupMiddleware(MiddlewareMixin):
         """Create backup in background thread"""
         try:
             logger.info("Creating automatic backup via middleware...")
-            call_command('run_auto_backup')
+            # The run is already claimed, skip the command's own recency check
+            call_command('run_auto_backup', force=True)
             
         except Exception as e:
             logger.error(f"Error creating backup in middleware: {str(e)}")
+            reschedule_backup(self.RETRY_SECONDS)
+        
+        finally:
+            connection.close()
 
 class RequestBasedBackupTrigger(MiddlewareMixin):
     """
-    Alternative backup trigger that runs on specific requests
+    Alternative backup trigger that runs on requests
+
+    The next due time lives in a shared BackupSchedule row and is cached in
+    memory, so an ordinary request only compares two timestamps. When it
+    passes, one request per process consults the row, and a conditional
+    UPDATE lets a single worker across all processes claim the run.
     """
     
+    # Retry delay after a failed backup or schedule lookup
+    RETRY_SECONDS = 60
+    
     def __init__(self, get_response):
+        if not settings.AUTO_BACKUP_TRIGGER_ENABLED:
+            raise MiddlewareNotUsed
         self.get_response = get_response
+        self._next_due_at = None
+        self._check_lock = threading.Lock()
         super().__init__(get_response)
 
     def process_request(self, request):
-        """Trigger backup check on backup-related requests"""
-        # Only trigger on backup management or dashboard requests
-        if any(path in request.path for path in ['/backup-management/', '/timeline/', '/']):
+        """Trigger backup check once the cached due time has passed"""
+        if self._next_due_at is None or timezone.now() >= self._next_due_at:
             self._check_backup_async()
         
         return None
 
     def _check_backup_async(self):
-        """Check and create backup if needed (async)"""
+        """Claim and start a due backup (async)"""
+        # Other threads of this process keep serving while one checks
+        if not self._check_lock.acquire(blocking=False):
+            return
+        
         try:
-            # Get the last automatic backup
-            last_backup = DataBackup.objects.filter(
-                backup_type='AUTO'
-            ).order_by('-created_at').first()
-            
-            if not last_backup:
-                # No backups exist, create one
-                threading.Thread(target=self._create_backup, daemon=True).start()
-                return
-                
-            # Check if last backup was more than 10 minutes ago
-            time_since_last = timezone.now() - last_backup.created_at
-            if time_since_last.total_seconds() >= (10 * 60):  # 10 minutes
+            claimed, self._next_due_at = claim_due_backup()
+            if claimed:
                 threading.Thread(target=self._create_backup, daemon=True).start()
                 
         except Exception as e:
+            self._next_due_at = timezone.now() + timezone.timedelta(seconds=self.RETRY_SECONDS)
             logger.error(f"Error in request-based backup trigger: {str(e)}")
+        
+        finally:
+            self._check_lock.release()
 
     def _create_backup(self):
         """Create backup in background"""
         try:
-            call_command('run_auto_backup')
+            # The run is already claimed, skip the command's own recency check
+            call_command('run_auto_backup', force=True)
             logger.info("Automatic backup created via request trigger")
             
         except Exception as e:
-            logger.error(f"Error creating backup via request trigger: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error creating backup via request trigger: {str(e)}")
+            self._next_due_at = reschedule_backup(self.RETRY_SECONDS)
+        
+        finally:
+            connection.close()
@@ -0,0 +1,205 @@
+import io
+import logging
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Booking, Room, RoomType, CustomUser
+from .availability import availability_index
+from .data_version import bump_data_version
+from .backup_utils import EXCEL_AVAILABLE, get_status_from_display, get_payment_status_from_display
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+logger = logging.getLogger(__name__)
+
+RESTORE_BATCH_SIZE = 500
+
+BOOKING_RESTORE_FIELDS = [
+    'room', 'guest_name', 'guest_contact', 'check_in_date', 'check_out_date',
+    'total_amount', 'paid_amount', 'status', 'payment_status', 'notes',
+    'created_by', 'created_at', 'updated_at',
+]
+
+
+def get_restore_chain(backup):
+    """
+    Backups to replay, oldest first, to get back to `backup`: the backup
+    itself for a full one, or its full base plus its differentials up to it.
+    """
+    if backup.backup_type != 'DIFF':
+        return [backup]
+    differentials = backup.base_backup.differentials.filter(
+        created_at__lte=backup.created_at
+    ).order_by('created_at', 'id')
+    return [backup.base_backup] + list(differentials)
+
+
+def read_backup_file(backup):
+    """Parse a backup file into booking rows by id, deleted booking ids and room rows"""
+    if not EXCEL_AVAILABLE or load_workbook is None:
+        raise ImportError("Excel libraries (openpyxl, pandas) not available")
+
+    wb = load_workbook(io.BytesIO(backup.read_file()), read_only=True)
+    try:
+        def sheet_rows(title):
+            if title not in wb.sheetnames:
+                return []
+            rows = wb[title].iter_rows(values_only=True)
+            headers = next(rows, None) or []
+            return [dict(zip(headers, row)) for row in rows if row and row[0] is not None]
+
+        return {
+            'bookings': {int(row['ID']): row for row in sheet_rows('Bookings')},
+            'deleted': [int(row['Booking ID']) for row in sheet_rows('Deleted')],
+            'rooms': sheet_rows('Rooms'),
+        }
+    finally:
+        wb.close()
+
+
+def restore_backup(backup, user, dry_run=False):
+    """
+    Restore bookings to the state captured by `backup`, replaying its full
+    base and then each differential in order (changed rows replace earlier
+    ones, deleted ids are dropped).
+
+    Rooms missing from the database are recreated; bookings are matched by
+    id, so the result mirrors the backup exactly: bookings it doesn't hold
+    are deleted. `user` becomes the creator of bookings whose creator no
+    longer exists. Returns counts; with dry_run nothing is written.
+    """
+    chain = get_restore_chain(backup)
+    bookings, rooms = {}, []
+    for link in chain:
+        data = read_backup_file(link)
+        bookings.update(data['bookings'])
+        for booking_id in data['deleted']:
+            bookings.pop(booking_id, None)
+        rooms = data['rooms'] or rooms
+
+    existing_ids = set(Booking.objects.values_list('id', flat=True))
+    result = {
+        'chain': [link.file_name for link in chain],
+        'bookings': len(bookings),
+        'created': len(bookings.keys() - existing_ids),
+        'updated': len(bookings.keys() & existing_ids),
+        'deleted': len(existing_ids - bookings.keys()),
+    }
+    if dry_run:
+        return result
+
+    with transaction.atomic():
+        rooms_by_number = _restore_rooms(rooms)
+        users_by_name = {u.username: u for u in CustomUser.objects.all()}
+
+        now = timezone.now()
+        objects = [
+            _booking_from_row(booking_id, row, rooms_by_number, users_by_name, user, now)
+            for booking_id, row in bookings.items()
+        ]
+
+        stale_ids = list(existing_ids - bookings.keys())
+        for start in range(0, len(stale_ids), RESTORE_BATCH_SIZE):
+            # Regular delete: signals record tombstones for synced clients
+            Booking.objects.filter(id__in=stale_ids[start:start + RESTORE_BATCH_SIZE]).delete()
+
+        to_update = [booking for booking in objects if booking.id in existing_ids]
+        to_create = [booking for booking in objects if booking.id not in existing_ids]
+
+        # updated_at is set to now so incremental sync clients pick up every restored booking
+        Booking.objects.bulk_update(to_update, BOOKING_RESTORE_FIELDS, batch_size=RESTORE_BATCH_SIZE)
+        # bulk_create stamps created_at with now; put back the backed-up value
+        created_at = {booking.id: booking.created_at for booking in to_create}
+        Booking.objects.bulk_create(to_create, batch_size=RESTORE_BATCH_SIZE)
+        for booking in to_create:
+            booking.created_at = created_at[booking.id]
+        Booking.objects.bulk_update(to_create, ['created_at'], batch_size=RESTORE_BATCH_SIZE)
+
+        _reset_booking_sequence()
+
+        # Bulk writes bypass the model signals
+        bump_data_version()
+        transaction.on_commit(availability_index.invalidate)
+
+    logger.info(f"Restored {len(objects)} bookings from {', '.join(result['chain'])}")
+    return result
+
+
+def _restore_rooms(room_rows):
+    """Recreate rooms (and room types) listed in the backup but missing here"""
+    rooms_by_number = {room.room_number: room for room in Room.objects.all()}
+    room_types = {room_type.name: room_type for room_type in RoomType.objects.all()}
+
+    for row in room_rows:
+        room_number = str(row['Room Number']).strip()
+        if room_number in rooms_by_number:
+            continue
+        room_type = room_types.get(row['Room Type'])
+        if room_type is None:
+            room_type = RoomType.objects.create(
+                name=row['Room Type'],
+                base_weekday_rate=Decimal(str(row['Weekday Rate'] or 0)),
+                base_weekend_rate=Decimal(str(row['Weekend Rate'] or 0)),
+            )
+            room_types[room_type.name] = room_type
+        rooms_by_number[room_number] = Room.objects.create(
+            room_number=room_number,
+            room_type=room_type,
+            is_active=bool(row['Is Active']),
+        )
+
+    return rooms_by_number
+
+
+def _booking_from_row(booking_id, row, rooms_by_number, users_by_name, user, now):
+    room_number = str(row['Room Number']).strip()
+    if room_number not in rooms_by_number:
+        raise ValueError(f"Booking {booking_id}: room {room_number} is not in the backup or the database")
+
+    return Booking(
+        id=booking_id,
+        room=rooms_by_number[room_number],
+        guest_name=row['Guest Name'] or '',
+        guest_contact=row['Guest Contact'] or '',
+        check_in_date=_to_date(row['Check In Date']),
+        check_out_date=_to_date(row['Check Out Date']),
+        total_amount=Decimal(str(row['Total Amount'] or 0)),
+        paid_amount=Decimal(str(row['Paid Amount'] or 0)),
+        status=get_status_from_display(str(row['Status'])),
+        payment_status=get_payment_status_from_display(str(row['Payment Status'])),
+        notes=row['Notes'] or '',
+        created_by=users_by_name.get(row['Created By'], user),
+        created_at=_to_datetime(row['Created At']) or now,
+        updated_at=now,
+    )
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _to_datetime(value):
+    """Backups write timestamps as UTC strings"""
+    if not value:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.strptime(str(value), '%Y-%m-%d %H:%M:%S')
+    return value.replace(tzinfo=dt_timezone.utc) if timezone.is_naive(value) else value
+
+
+def _reset_booking_sequence():
+    """Move the id sequence past explicitly inserted ids (PostgreSQL)"""
+    statements = connection.ops.sequence_reset_sql(no_style(), [Booking])
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
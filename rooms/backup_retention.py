@@ -0,0 +1,114 @@
+import logging
+from django.conf import settings
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When, Window
+from django.db.models.functions import RowNumber, Trunc
+from django.utils import timezone
+from .models import DataBackup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_TIERS = [
+    (24, None),
+    (24 * 7, 'hour'),
+    (24 * 90, 'day'),
+]
+
+# Automatic backup types subject to retention; manual backups and imports are kept
+RETAINED_BACKUP_TYPES = ['AUTO', 'DIFF']
+
+
+def get_retention_tiers():
+    """(max_age_hours, keep_one_per) pairs, youngest tier first"""
+    tiers = getattr(settings, 'BACKUP_RETENTION_TIERS', DEFAULT_RETENTION_TIERS)
+    return sorted(tiers, key=lambda tier: tier[0])
+
+
+def rank_backups_for_retention(now=None):
+    """
+    Rank automatic backups within their retention bucket in one windowed
+    query. Returns (id, backup_type, base_backup_id, tier, rank) rows: tier
+    is None past the oldest tier, and rank 1 is the backup kept for its
+    bucket: the newest full one, else the newest differential (every
+    backup is its own bucket in a tier keeping all of them).
+    """
+    now = now or timezone.now()
+    tiers = get_retention_tiers()
+    tzinfo = timezone.get_current_timezone()
+
+    tier = Case(
+        *[
+            When(created_at__gte=now - timezone.timedelta(hours=max_age_hours), then=Value(index))
+            for index, (max_age_hours, _) in enumerate(tiers)
+        ],
+        default=None,
+        output_field=IntegerField()
+    )
+    bucket = Case(
+        *[
+            When(tier=index, then=F('created_at') if keep_one_per is None else Trunc(
+                'created_at', keep_one_per, output_field=DateTimeField(), tzinfo=tzinfo
+            ))
+            for index, (_, keep_one_per) in enumerate(tiers)
+        ],
+        default=None,
+        output_field=DateTimeField()
+    )
+
+    full_first = Case(When(backup_type='AUTO', then=Value(0)), default=Value(1), output_field=IntegerField())
+
+    return list(
+        DataBackup.objects.filter(backup_type__in=RETAINED_BACKUP_TYPES)
+        .annotate(tier=tier)
+        .annotate(bucket=bucket)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('tier'), F('bucket')],
+            # Full backups first: a kept differential also keeps its base
+            order_by=[full_first.asc(), F('created_at').desc()]
+        ))
+        .values_list('id', 'backup_type', 'base_backup_id', 'tier', 'rank')
+    )
+
+
+def select_backups_to_delete(now=None):
+    """Ids of automatic backups the retention tiers no longer keep"""
+    ranked = rank_backups_for_retention(now)
+
+    keep = {backup_id for backup_id, _, _, tier, rank in ranked if tier is not None and rank == 1}
+
+    # The newest automatic backup stands for the current data while it is
+    # unchanged, and the newest full one is the base of the next differentials
+    latest = DataBackup.objects.filter(backup_type__in=RETAINED_BACKUP_TYPES).order_by('-created_at')
+    keep.update(latest.values_list('id', flat=True)[:1])
+    keep.update(latest.filter(backup_type='AUTO').values_list('id', flat=True)[:1])
+
+    # A kept differential needs its full base; deleting a base deletes its differentials
+    keep.update(base_id for backup_id, _, base_id, _, _ in ranked if backup_id in keep and base_id)
+
+    return [backup_id for backup_id, _, _, _, _ in ranked if backup_id not in keep]
+
+
+def cleanup_old_backups(now=None, batch_size=None):
+    """
+    Thin out automatic backups according to BACKUP_RETENTION_TIERS: by
+    default every backup for 24 hours, then one per hour for a week, then
+    one per day for 90 days. Rows are deleted in batches of
+    BACKUP_RETENTION_BATCH_SIZE, each its own short transaction; stored
+    files go when no other backup shares them (see rooms.signals).
+    Returns the number of backups deleted.
+    """
+    batch_size = batch_size or getattr(settings, 'BACKUP_RETENTION_BATCH_SIZE', 200)
+    backup_ids = select_backups_to_delete(now)
+
+    deleted_count = 0
+    for start in range(0, len(backup_ids), batch_size):
+        batch = backup_ids[start:start + batch_size]
+        # Differentials of a deleted base go with it: deleted first, loading
+        # only what the delete signal needs, so the cascade finds none left
+        for backups in (DataBackup.objects.filter(base_backup_id__in=batch), DataBackup.objects.filter(id__in=batch)):
+            _, deleted = backups.only('id', 'storage_key').delete()
+            deleted_count += deleted.get(DataBackup._meta.label, 0)
+
+    if deleted_count:
+        logger.info(f"Backup retention removed {deleted_count} automatic backups")
+    return deleted_count
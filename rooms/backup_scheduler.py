@@ -3,7 +3,7 @@ import time
 from django.utils import timezone
 from django.conf import settings
 from django.core.management import call_command
-from rooms.models import DataBackup, ActivityLog
+from rooms.models import DataBackup, ActivityLog, BackupSchedule
 import logging
 
 logger = logging.getLogger(__name__)
@@ -41,8 +41,8 @@ class BackupScheduler:
         
         while self.running:
             try:
-                # Check if it's time for a backup (every 10 minutes)
-                if self._should_create_backup():
+                # Claim the run if it's due (every AUTO_BACKUP_INTERVAL)
+                if self._claim_due_backup():
                     logger.info("Creating automatic backup...")
                     self._create_backup()
                     
@@ -54,21 +54,11 @@ class BackupScheduler:
                 # Continue running even if there's an error
                 time.sleep(60)
                 
-    def _should_create_backup(self):
-        """Check if we should create a backup now"""
+    def _claim_due_backup(self):
+        """Claim the next run on the shared schedule, if it is due"""
         try:
-            # Get the last automatic backup
-            last_backup = DataBackup.objects.filter(
-                backup_type='AUTO'
-            ).order_by('-created_at').first()
-            
-            if not last_backup:
-                # No backups exist, create one
-                return True
-                
-            # Check if last backup was more than 10 minutes ago
-            time_since_last = timezone.now() - last_backup.created_at
-            return time_since_last.total_seconds() >= (10 * 60)  # 10 minutes
+            claimed, _ = claim_due_backup()
+            return claimed
             
         except Exception as e:
             logger.error(f"Error checking backup schedule: {str(e)}")
@@ -77,12 +67,13 @@ class BackupScheduler:
     def _create_backup(self):
         """Create an automatic backup"""
         try:
-            # Use the management command to create backup
-            call_command('run_auto_backup')
+            # The run is already claimed, skip the command's own recency check
+            call_command('run_auto_backup', force=True)
             logger.info("Automatic backup created successfully")
             
         except Exception as e:
             logger.error(f"Error creating automatic backup: {str(e)}")
+            reschedule_backup(60)
 
 # Global scheduler instance
 _scheduler = None
@@ -111,4 +102,60 @@ def stop_backup_scheduler():
     global _scheduler
     if _scheduler:
         _scheduler.stop()
-        _scheduler = None
\ No newline at end of file
+        _scheduler = None
+
+AUTO_BACKUP_SCHEDULE = 'auto'
+
+
+def get_auto_backup_interval():
+    """Seconds between automatic backups"""
+    return getattr(settings, 'AUTO_BACKUP_INTERVAL', 600)
+
+
+def get_backup_schedule(name=AUTO_BACKUP_SCHEDULE):
+    """Return the shared schedule row, creating it from the last automatic backup"""
+    schedule = BackupSchedule.objects.filter(name=name).first()
+    if schedule:
+        return schedule
+
+    last_backup = DataBackup.objects.filter(
+        backup_type__in=['AUTO', 'DIFF']
+    ).order_by('-created_at').only('created_at').first()
+    next_due_at = timezone.now()
+    if last_backup:
+        next_due_at = last_backup.created_at + timezone.timedelta(seconds=get_auto_backup_interval())
+    schedule, _ = BackupSchedule.objects.get_or_create(name=name, defaults={'next_due_at': next_due_at})
+    return schedule
+
+
+def claim_due_backup(name=AUTO_BACKUP_SCHEDULE, grace_seconds=0):
+    """
+    Claim the next backup run if it is due. Returns (claimed, next_due_at).
+
+    The claim is a single conditional UPDATE on the schedule row: the row
+    lock serialises concurrent workers, and only the one whose UPDATE still
+    sees a past next_due_at gets claimed=True and should run the backup.
+    A run due within grace_seconds counts as due, for callers woken on a
+    fixed period that would otherwise miss it by a few seconds.
+    """
+    # Created first: a new schedule is due at its creation time, which has
+    # to be before the now this claim compares against
+    get_backup_schedule(name)
+    now = timezone.now()
+    next_due_at = now + timezone.timedelta(seconds=get_auto_backup_interval())
+
+    due_by = now + timezone.timedelta(seconds=grace_seconds)
+    claimed = BackupSchedule.objects.filter(name=name, next_due_at__lte=due_by).update(
+        next_due_at=next_due_at,
+        last_claimed_at=now,
+    )
+    if claimed:
+        return True, next_due_at
+    return False, BackupSchedule.objects.values_list('next_due_at', flat=True).get(name=name)
+
+
+def reschedule_backup(seconds, name=AUTO_BACKUP_SCHEDULE):
+    """Move the next run to `seconds` from now, e.g. to retry soon after a failure"""
+    next_due_at = timezone.now() + timezone.timedelta(seconds=seconds)
+    BackupSchedule.objects.filter(name=name).update(next_due_at=next_due_at)
+    return next_due_at
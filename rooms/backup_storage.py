@@ -0,0 +1,190 @@
+import hashlib
+import io
+import logging
+import tempfile
+import threading
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.db import models
+from django.db.models.functions import Substr
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BackupStore:
+    """
+    Backup files kept outside the database on any Django storage backend
+    (a persistent disk, or e.g. an object storage backend from
+    django-storages).
+
+    Every save writes its own file, named after the SHA-256 of the content;
+    the storage picks another name if that one is taken, so a file is only
+    shared when a caller hands its key to another record on purpose.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    @staticmethod
+    def key_for(checksum):
+        return f'{checksum[:2]}/{checksum[2:4]}/{checksum}.xlsx'
+
+    def save(self, content):
+        """
+        Store bytes or a readable file, streaming it through the hash in
+        chunks. Returns (key, size, checksum).
+        """
+        source = io.BytesIO(content) if isinstance(content, (bytes, bytearray, memoryview)) else content
+        digest = hashlib.sha256()
+        size = 0
+
+        with tempfile.TemporaryFile() as spooled:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                spooled.write(chunk)
+
+            checksum = digest.hexdigest()
+            spooled.seek(0)
+            key = self.storage.save(self.key_for(checksum), File(spooled))
+
+        return key, size, checksum
+
+    def open(self, key):
+        """Open a stored file for reading"""
+        return self.storage.open(key, 'rb')
+
+    def read(self, key):
+        with self.open(key) as f:
+            return f.read()
+
+    def delete(self, key):
+        self.storage.delete(key)
+
+
+class DatabaseFile(io.RawIOBase):
+    """
+    Seekable, read-only view of a file kept in a record's file_data column.
+    Each read fetches just the requested slice with SUBSTRING, so streaming
+    a large backup never holds the whole blob in memory.
+    """
+
+    def __init__(self, record):
+        self.model = type(record)
+        self.pk = record.pk
+        self.size = record.file_size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self.position = position
+        return position
+
+    def read(self, size=-1):
+        remaining = max(self.size - self.position, 0)
+        length = remaining if size is None or size < 0 else min(size, remaining)
+        if not length:
+            return b''
+        # SUBSTRING positions count from 1
+        chunk = self.model._base_manager.filter(pk=self.pk).values_list(
+            Substr('file_data', self.position + 1, length, output_field=models.BinaryField()),
+            flat=True
+        ).get()
+        chunk = bytes(chunk or b'')
+        self.position += len(chunk)
+        return chunk
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_backup_store():
+    """
+    Return the store over the storage backend configured by BACKUP_STORAGE,
+    or None when backup files are kept in the database
+    """
+    global _store
+    config = getattr(settings, 'BACKUP_STORAGE', None)
+    if not config:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                storage_class = import_string(config.get('BACKEND', 'django.core.files.storage.FileSystemStorage'))
+                _store = BackupStore(storage_class(**config.get('OPTIONS', {})))
+    return _store
+
+
+def store_backup_file(content):
+    """
+    Keep bytes or a readable file as a backup file. Returns the
+    storage_key, file_size, checksum and file_data values for the record
+    holding it: in the backup store when one is configured, otherwise in
+    the record's file_data column.
+    """
+    store = get_backup_store()
+    if store is not None:
+        storage_key, file_size, checksum = store.save(content)
+        return {'storage_key': storage_key, 'file_size': file_size, 'checksum': checksum, 'file_data': None}
+
+    data = bytes(content) if isinstance(content, (bytes, bytearray, memoryview)) else content.read()
+    return {
+        'storage_key': '',
+        'file_size': len(data),
+        'checksum': hashlib.sha256(data).hexdigest(),
+        'file_data': data,
+    }
+
+
+def open_stored_file(record):
+    """Open the backup file of a record filled from store_backup_file"""
+    if not record.storage_key:
+        if 'file_data' in record.get_deferred_fields():
+            return DatabaseFile(record)
+        # Already loaded: BytesIO shares a bytes object instead of copying it
+        data = record.file_data or b''
+        return io.BytesIO(data if isinstance(data, bytes) else bytes(data))
+    store = get_backup_store()
+    if store is None:
+        raise ImproperlyConfigured(
+            f"{record._meta.object_name} {record.pk} is in the backup store but BACKUP_STORAGE is not set"
+        )
+    return store.open(record.storage_key)
+
+
+def delete_stored_file(storage_key):
+    """Remove a file from the backup store; files kept in the database go with their row"""
+    store = get_backup_store()
+    if storage_key and store is not None:
+        store.delete(storage_key)
@@ -1,211 +1,199 @@
 import io
+import itertools
+import tempfile
+from django.conf import settings
+from django.db.models import Subquery
 from django.utils import timezone
 from django.http import HttpResponse
-from .models import Booking, Room, RoomType, DataBackup, CustomUser
+from .models import Booking, BookingTombstone, Room, RoomType, DataBackup, CustomUser
 from .timezone_utils import now_in_philippines, format_philippine_time
+from .data_version import get_data_fingerprint
+from .backup_storage import store_backup_file
 
 try:
     import pandas as pd
     from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
     EXCEL_AVAILABLE = True
 except ImportError:
     EXCEL_AVAILABLE = False
 
 
-def export_bookings_to_excel(start_date=None, end_date=None):
-    """
-    Export bookings data to Excel format
-    Returns: BytesIO object containing Excel file data
-    """
-    if not EXCEL_AVAILABLE:
-        raise ImportError("Excel libraries (openpyxl, pandas) not available")
-    # Get bookings data
-    bookings_query = Booking.objects.select_related('room', 'room__room_type', 'created_by')
-    
-    if start_date and end_date:
-        bookings_query = bookings_query.filter(
-            check_in_date__gte=start_date,
-            check_out_date__lte=end_date
-        )
-    
-    bookings = bookings_query.order_by('-created_at')
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Bookings"
-    
-    # Define headers
-    headers = [
-        'ID', 'Room Number', 'Room Type', 'Guest Name', 'Guest Contact',
-        'Check In Date', 'Check Out Date', 'Total Amount', 'Paid Amount',
-        'Status', 'Payment Status', 'Notes', 'Created By', 'Created At', 'Updated At'
-    ]
-    
-    # Style headers
+BOOKING_EXPORT_HEADERS = [
+    'ID', 'Room Number', 'Room Type', 'Guest Name', 'Guest Contact',
+    'Check In Date', 'Check Out Date', 'Total Amount', 'Paid Amount',
+    'Status', 'Payment Status', 'Notes', 'Created By', 'Created At', 'Updated At'
+]
+
+# Columns read for each exported booking, in BOOKING_EXPORT_HEADERS order
+BOOKING_EXPORT_FIELDS = [
+    'id', 'room__room_number', 'room__room_type__name', 'guest_name', 'guest_contact',
+    'check_in_date', 'check_out_date', 'total_amount', 'paid_amount',
+    'status', 'payment_status', 'notes', 'created_by__username', 'created_at', 'updated_at'
+]
+
+ROOM_EXPORT_HEADERS = ['ID', 'Room Number', 'Room Type', 'Room Type Display', 'Is Active',
+                       'Weekday Rate', 'Weekend Rate']
+
+# Bookings fetched per database round trip while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+# Column widths are estimated from this many leading rows rather than from
+# every cell: write-only sheets need them before any row is written
+WIDTH_SAMPLE_ROWS = 200
+MAX_COLUMN_WIDTH = 50
+
+# Differential backups re-read rows changed up to this long before their
+# base was taken, so a write committing during the full export is not lost
+DIFF_OVERLAP_SECONDS = 60
+
+
+def header_cells(ws, headers):
+    """Styled header row cells for a write-only sheet"""
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     
-    # Write headers
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = Alignment(horizontal="center")
+        cells.append(cell)
+    return cells
+
+
+def write_sheet(ws, headers, rows):
+    """
+    Write a header and rows to a write-only sheet. Widths are sized from the
+    header and the first WIDTH_SAMPLE_ROWS rows; the rest is streamed.
+    """
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, WIDTH_SAMPLE_ROWS))
     
-    # Write data
-    for row_num, booking in enumerate(bookings, 2):
-        ws.cell(row=row_num, column=1, value=booking.id)
-        ws.cell(row=row_num, column=2, value=booking.room.room_number)
-        ws.cell(row=row_num, column=3, value=booking.room.room_type.get_name_display())
-        ws.cell(row=row_num, column=4, value=booking.guest_name)
-        ws.cell(row=row_num, column=5, value=booking.guest_contact)
-        ws.cell(row=row_num, column=6, value=booking.check_in_date.strftime('%Y-%m-%d'))
-        ws.cell(row=row_num, column=7, value=booking.check_out_date.strftime('%Y-%m-%d'))
-        ws.cell(row=row_num, column=8, value=float(booking.total_amount))
-        ws.cell(row=row_num, column=9, value=float(booking.paid_amount))
-        ws.cell(row=row_num, column=10, value=booking.get_status_display())
-        ws.cell(row=row_num, column=11, value=booking.get_payment_status_display())
-        ws.cell(row=row_num, column=12, value=booking.notes)
-        ws.cell(row=row_num, column=13, value=booking.created_by.username if booking.created_by else '')
-        ws.cell(row=row_num, column=14, value=booking.created_at.strftime('%Y-%m-%d %H:%M:%S'))
-        ws.cell(row=row_num, column=15, value=booking.updated_at.strftime('%Y-%m-%d %H:%M:%S'))
-    
-    # Add rooms data sheet
-    rooms_ws = wb.create_sheet(title="Rooms")
-    room_headers = ['ID', 'Room Number', 'Room Type', 'Room Type Display', 'Is Active', 
-                   'Weekday Rate', 'Weekend Rate']
+    for col_num, header in enumerate(headers, 1):
+        max_length = max([len(str(header))] + [len(str(row[col_num - 1])) for row in sample if row[col_num - 1] is not None])
+        ws.column_dimensions[get_column_letter(col_num)].width = min(max_length + 2, MAX_COLUMN_WIDTH)
     
-    # Write room headers
-    for col_num, header in enumerate(room_headers, 1):
-        cell = rooms_ws.cell(row=1, column=col_num)
-        cell.value = header
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
+    ws.append(header_cells(ws, headers))
+    for row in itertools.chain(sample, rows):
+        ws.append(row)
+
+
+def booking_export_rows(bookings):
+    """Export rows for a Booking queryset, streamed from values_list in chunks"""
+    room_type_display = dict(RoomType.ROOM_TYPE_CHOICES)
+    status_display = dict(Booking.STATUS_CHOICES)
+    payment_status_display = dict(Booking.PAYMENT_STATUS_CHOICES)
     
-    # Write room data
+    for (booking_id, room_number, room_type, guest_name, guest_contact, check_in_date, check_out_date,
+         total_amount, paid_amount, status, payment_status, notes, created_by, created_at, updated_at
+         ) in bookings.values_list(*BOOKING_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            booking_id,
+            room_number,
+            room_type_display.get(room_type, room_type),
+            guest_name,
+            guest_contact,
+            check_in_date.strftime('%Y-%m-%d'),
+            check_out_date.strftime('%Y-%m-%d'),
+            float(total_amount),
+            float(paid_amount),
+            status_display.get(status, status),
+            payment_status_display.get(payment_status, payment_status),
+            notes,
+            created_by or '',
+            created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+        ]
+
+
+def report_progress(rows, progress, every=EXPORT_CHUNK_SIZE):
+    """Pass rows through, calling progress(count) after every `every` rows"""
+    for count, row in enumerate(rows, 1):
+        yield row
+        if count % every == 0:
+            progress(count)
+
+
+def room_export_rows():
+    """Rows of the Rooms sheet every backup carries"""
     rooms = Room.objects.select_related('room_type').order_by('room_number')
-    for row_num, room in enumerate(rooms, 2):
-        rooms_ws.cell(row=row_num, column=1, value=room.id)
-        rooms_ws.cell(row=row_num, column=2, value=room.room_number)
-        rooms_ws.cell(row=row_num, column=3, value=room.room_type.name)
-        rooms_ws.cell(row=row_num, column=4, value=room.room_type.get_name_display())
-        rooms_ws.cell(row=row_num, column=5, value=room.is_active)
-        rooms_ws.cell(row=row_num, column=6, value=float(room.room_type.base_weekday_rate))
-        rooms_ws.cell(row=row_num, column=7, value=float(room.room_type.base_weekend_rate))
+    for room in rooms:
+        yield [
+            room.id,
+            room.room_number,
+            room.room_type.name,
+            room.room_type.get_name_display(),
+            room.is_active,
+            float(room.room_type.base_weekday_rate),
+            float(room.room_type.base_weekend_rate),
+        ]
+
+
+def write_bookings_workbook(output, start_date=None, end_date=None, progress=None):
+    """
+    Write the bookings export to a file-like object with write-only sheets:
+    rows go straight to openpyxl's temporary files instead of an in-memory
+    cell grid, so memory stays flat however many bookings there are.
+    A progress(rows_written) callback is called every EXPORT_CHUNK_SIZE
+    booking rows.
+    """
+    if not EXCEL_AVAILABLE:
+        raise ImportError("Excel libraries (openpyxl, pandas) not available")
+    # Get bookings data
+    bookings = Booking.objects.all()
+    
+    if start_date and end_date:
+        bookings = bookings.filter(
+            check_in_date__gte=start_date,
+            check_out_date__lte=end_date
+        )
     
-    # Auto-adjust column widths
-    for ws_sheet in [ws, rooms_ws]:
-        for column in ws_sheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws_sheet.column_dimensions[column_letter].width = adjusted_width
+    rows = booking_export_rows(bookings.order_by('-created_at'))
+    if progress is not None:
+        rows = report_progress(rows, progress)
     
-    # Save to BytesIO
+    wb = Workbook(write_only=True)
+    write_sheet(wb.create_sheet(title="Bookings"), BOOKING_EXPORT_HEADERS, rows)
+    write_sheet(wb.create_sheet(title="Rooms"), ROOM_EXPORT_HEADERS, room_export_rows())
+    wb.save(output)
+    return output
+
+
+def export_bookings_to_excel(start_date=None, end_date=None):
+    """
+    Export bookings data to Excel format
+    Returns: BytesIO object containing Excel file data
+    """
     excel_buffer = io.BytesIO()
-    wb.save(excel_buffer)
+    write_bookings_workbook(excel_buffer, start_date, end_date)
     excel_buffer.seek(0)
     
     return excel_buffer
 
 
-def import_bookings_from_excel(excel_file, user=None):
+def export_booking_changes_to_excel(changed_bookings, deleted_booking_ids):
     """
-    Import bookings from Excel file
-    Returns: dict with success status, message, and imported count
+    Export a differential backup: the changed bookings (same columns as a
+    full export), the ids of deleted bookings and the current rooms
+    Returns: BytesIO object containing Excel file data
     """
     if not EXCEL_AVAILABLE:
-        return {
-            'success': False,
-            'message': 'Excel libraries not available for import functionality',
-            'imported_count': 0
-        }
+        raise ImportError("Excel libraries (openpyxl, pandas) not available")
     
-    try:
-        # Read Excel file
-        df = pd.read_excel(excel_file, sheet_name='Bookings')
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Get or create room
-                room_number = str(row['Room Number']).strip()
-                room = Room.objects.filter(room_number=room_number).first()
-                
-                if not room:
-                    errors.append(f"Row {index + 2}: Room {room_number} not found")
-                    continue
-                
-                # Check if booking already exists (by guest name, room, and dates)
-                existing_booking = Booking.objects.filter(
-                    room=room,
-                    guest_name=str(row['Guest Name']).strip(),
-                    check_in_date=pd.to_datetime(row['Check In Date']).date(),
-                    check_out_date=pd.to_datetime(row['Check Out Date']).date()
-                ).first()
-                
-                if existing_booking:
-                    # Update existing booking
-                    existing_booking.guest_contact = str(row.get('Guest Contact', '')).strip()
-                    existing_booking.total_amount = row['Total Amount']
-                    existing_booking.paid_amount = row.get('Paid Amount', 0)
-                    existing_booking.status = get_status_from_display(str(row.get('Status', 'PENCIL')))
-                    existing_booking.payment_status = get_payment_status_from_display(str(row.get('Payment Status', 'UNPAID')))
-                    existing_booking.notes = str(row.get('Notes', '')).strip()
-                    existing_booking.save()
-                    imported_count += 1
-                else:
-                    # Create new booking
-                    booking = Booking.objects.create(
-                        room=room,
-                        guest_name=str(row['Guest Name']).strip(),
-                        guest_contact=str(row.get('Guest Contact', '')).strip(),
-                        check_in_date=pd.to_datetime(row['Check In Date']).date(),
-                        check_out_date=pd.to_datetime(row['Check Out Date']).date(),
-                        total_amount=row['Total Amount'],
-                        paid_amount=row.get('Paid Amount', 0),
-                        status=get_status_from_display(str(row.get('Status', 'PENCIL'))),
-                        payment_status=get_payment_status_from_display(str(row.get('Payment Status', 'UNPAID'))),
-                        notes=str(row.get('Notes', '')).strip(),
-                        created_by=user
-                    )
-                    imported_count += 1
-                    
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        if errors:
-            return {
-                'success': False,
-                'message': f"Imported {imported_count} bookings with {len(errors)} errors",
-                'errors': errors,
-                'imported_count': imported_count
-            }
-        else:
-            return {
-                'success': True,
-                'message': f"Successfully imported {imported_count} bookings",
-                'imported_count': imported_count
-            }
-            
-    except Exception as e:
-        return {
-            'success': False,
-            'message': f"Error reading Excel file: {str(e)}",
-            'imported_count': 0
-        }
+    wb = Workbook(write_only=True)
+    write_sheet(wb.create_sheet(title="Bookings"), BOOKING_EXPORT_HEADERS, booking_export_rows(changed_bookings))
+    write_sheet(wb.create_sheet(title="Deleted"), ['Booking ID'], ([booking_id] for booking_id in deleted_booking_ids))
+    write_sheet(wb.create_sheet(title="Rooms"), ROOM_EXPORT_HEADERS, room_export_rows())
+    
+    excel_buffer = io.BytesIO()
+    wb.save(excel_buffer)
+    excel_buffer.seek(0)
+    
+    return excel_buffer
 
 
 def get_status_from_display(display_value):
@@ -230,15 +218,38 @@ def get_payment_status_from_display(display_value):
     return status_map.get(display_value, 'UNPAID')
 
 
-def create_backup_record(backup_type='AUTO', user=None, file_data=None, notes=''):
+def create_backup_record(backup_type='AUTO', user=None, file_data=None, notes='', data_as_of=None,
+                         stored_file=None, progress=None):
     """
     Create a backup record in the database using Philippine timezone
+    file_data (bytes or a readable file) is kept by store_backup_file; pass
+    data_as_of with a file exported from this database beforehand, without
+    it file_data is treated as an upload. stored_file is a record already
+    holding the file (an import job), which hands it over to the backup.
+    progress is passed on to write_bookings_workbook when exporting.
     """
     ph_now = now_in_philippines()
     file_name = f"hotel_backup_{ph_now.strftime('%Y%m%d_%H%M%S')}_PHT.xlsx"
     
-    if file_data is None:
-        file_data = export_bookings_to_excel().getvalue()
+    # Taken before exporting: a write during the export makes the next
+    # automatic backup see a changed fingerprint rather than miss the write
+    data_fingerprint = get_data_fingerprint()
+    
+    if stored_file is not None:
+        file_fields = {
+            'storage_key': stored_file.storage_key,
+            'file_size': stored_file.file_size,
+            'checksum': stored_file.checksum,
+        }
+    elif file_data is None:
+        data_as_of = timezone.now()
+        # Spooled to disk rather than held in memory while it is stored
+        with tempfile.TemporaryFile() as export_file:
+            write_bookings_workbook(export_file, progress=progress)
+            export_file.seek(0)
+            file_fields = store_backup_file(export_file)
+    else:
+        file_fields = store_backup_file(file_data)
     
     booking_count = Booking.objects.count()
     room_count = Room.objects.count()
@@ -247,38 +258,138 @@ def create_backup_record(backup_type='AUTO', user=None, file_data=None, notes=''
         backup_type=backup_type,
         created_by=user,
         file_name=file_name,
-        file_data=file_data,
         booking_count=booking_count,
         room_count=room_count,
-        notes=notes
+        notes=notes,
+        data_fingerprint=data_fingerprint,
+        data_as_of=data_as_of,
+        **file_fields
     )
     
+    if stored_file is not None and not stored_file.storage_key:
+        # Copied inside the database rather than loaded into this process
+        DataBackup.objects.filter(id=backup.id).update(file_data=Subquery(
+            type(stored_file)._base_manager.filter(pk=stored_file.pk).values('file_data')[:1]
+        ))
+    
     return backup
 
 
-def cleanup_old_backups():
+def get_last_full_backup():
     """
-    Clean up old automatic backups according to 24-hour rotation rule
-    Keep only the last 144 backups (10 min intervals for 24 hours)
+    Latest automatic full backup, which differentials build on. Manual
+    backups can be deleted by hand, and deleting a base deletes its
+    differentials with it.
     """
-    cutoff_time = timezone.now() - timezone.timedelta(hours=24)
-    
-    # Get automatic backups older than 24 hours
-    old_backups = DataBackup.objects.filter(
+    return DataBackup.objects.filter(
         backup_type='AUTO',
-        created_at__lt=cutoff_time
-    ).order_by('-created_at')
+        data_as_of__isnull=False
+    ).order_by('-data_as_of').first()
+
+
+def create_differential_backup(base_backup, notes=''):
+    """
+    Create a differential backup holding the bookings changed (by
+    updated_at) or deleted (by tombstone) since base_backup was taken.
+    """
+    data_fingerprint = get_data_fingerprint()
+    data_as_of = timezone.now()
+    since = base_backup.data_as_of - timezone.timedelta(seconds=DIFF_OVERLAP_SECONDS)
     
-    # Keep manual backups and imports, only delete auto backups
-    deleted_count = 0
-    for backup in old_backups:
-        backup.delete()
-        deleted_count += 1
+    changed = Booking.objects.filter(updated_at__gt=since).order_by('updated_at', 'id')
+    deleted_ids = list(
+        BookingTombstone.objects.filter(deleted_at__gt=since).order_by('id').values_list('booking_id', flat=True)
+    )
+    changed_count = changed.count()
+    file_fields = store_backup_file(export_booking_changes_to_excel(changed, deleted_ids))
     
-    return deleted_count
+    ph_now = now_in_philippines()
+    return DataBackup.objects.create(
+        backup_type='DIFF',
+        base_backup=base_backup,
+        file_name=f"hotel_backup_{ph_now.strftime('%Y%m%d_%H%M%S')}_PHT_diff.xlsx",
+        booking_count=changed_count,
+        room_count=Room.objects.count(),
+        notes=f'{notes} ({changed_count} changed, {len(deleted_ids)} deleted since {base_backup.file_name})'.strip(),
+        data_fingerprint=data_fingerprint,
+        data_as_of=data_as_of,
+        **file_fields
+    )
+
+
+def create_auto_backup_if_changed(notes=''):
+    """
+    Create an automatic backup unless nothing changed since the last one.
+    When the data fingerprint still matches, the last automatic backup is
+    only marked as verified instead of exporting the same data again.
+    
+    A full snapshot is taken every BACKUP_FULL_INTERVAL_HOURS; in between,
+    automatic backups are differential against the last full one.
+    Returns: (backup, created)
+    """
+    last_backup = DataBackup.objects.filter(backup_type__in=['AUTO', 'DIFF']).order_by('-created_at').only(
+        'id', 'backup_type', 'data_fingerprint', 'created_at', 'file_name', 'booking_count', 'room_count'
+    ).first()
+    
+    if last_backup and last_backup.data_fingerprint and last_backup.data_fingerprint == get_data_fingerprint():
+        last_backup.verified_at = timezone.now()
+        DataBackup.objects.filter(id=last_backup.id).update(verified_at=last_backup.verified_at)
+        return last_backup, False
+    
+    full_interval = timezone.timedelta(hours=getattr(settings, 'BACKUP_FULL_INTERVAL_HOURS', 24))
+    base_backup = get_last_full_backup()
+    if base_backup and timezone.now() - base_backup.data_as_of < full_interval:
+        return create_differential_backup(base_backup, notes=notes), True
+    
+    return create_backup_record(backup_type='AUTO', notes=notes), True
 
 
 def generate_backup_filename():
     """Generate a standardized backup filename using Philippine time"""
     ph_now = now_in_philippines()
-    return f"hotel_backup_{ph_now.strftime('%Y%m%d_%H%M%S')}_PHT.xlsx"
\ No newline at end of file
+    return f"hotel_backup_{ph_now.strftime('%Y%m%d_%H%M%S')}_PHT.xlsx"
+
+
+def iter_file_chunks(file_obj, chunk_size=64 * 1024, length=None):
+    """
+    Yield a file's contents (or `length` bytes of it from the current
+    position) in chunks and close it at the end, for StreamingHttpResponse
+    """
+    try:
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = file_obj.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        file_obj.close()
+
+
+def parse_byte_range(header, size):
+    """
+    Parse a single-range `Range: bytes=...` header into an inclusive
+    (start, end) pair. Returns None when the header is absent, malformed or
+    asks for several ranges (the whole file is served instead) and raises
+    ValueError when the range lies outside the file.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise ValueError(f"Range start {start} is beyond the file size {size}")
+    if start < 0 or start > end:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Booking, BookingTombstone
+
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 2000
+
+BOOKING_SYNC_FIELDS = [
+    'id', 'room_id', 'guest_name', 'guest_contact', 'check_in_date', 'check_out_date',
+    'total_amount', 'paid_amount', 'status', 'payment_status', 'notes',
+    'created_by_id', 'created_at', 'updated_at',
+]
+
+
+def encode_cursor(updated_at, booking_id, tombstone_id):
+    """Opaque cursor: position in the updated_at stream and in the tombstone stream"""
+    payload = {
+        'u': [updated_at.isoformat() if updated_at else None, booking_id],
+        'd': tombstone_id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (updated_at, booking_id, tombstone_id) from a cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        updated_at = parse_datetime(payload['u'][0]) if payload['u'][0] else None
+        return updated_at, payload['u'][1], payload['d']
+    except (ValueError, KeyError, TypeError, IndexError):
+        raise ValueError('Invalid changes cursor')
+
+
+def get_booking_changes(cursor=None, since=None, limit=DEFAULT_CHANGES_LIMIT):
+    """
+    Return bookings created or updated, and bookings deleted, after a cursor.
+
+    Updates are paged by (updated_at, id) and deletions by tombstone id, both
+    keyset-style so a client that was offline for days catches up in chunks
+    of at most `limit` rows per stream. Without a cursor the sync starts at
+    `since` (a datetime), or at the beginning of history.
+
+    Rows changed in the last CHANGES_SETTLE_SECONDS are held back until the
+    next call, so a slow transaction committing an older updated_at can't
+    slip behind a cursor that already moved past it.
+    """
+    limit = max(1, min(int(limit), MAX_CHANGES_LIMIT))
+
+    if cursor:
+        updated_at, booking_id, tombstone_id = decode_cursor(cursor)
+    else:
+        updated_at, booking_id, tombstone_id = since, None, None
+
+    settled_before = timezone.now() - timedelta(seconds=getattr(settings, 'CHANGES_SETTLE_SECONDS', 5))
+
+    changed = Booking.objects.filter(updated_at__lte=settled_before)
+    if updated_at and booking_id is not None:
+        changed = changed.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=booking_id)
+        )
+    elif updated_at:
+        changed = changed.filter(updated_at__gt=updated_at)
+    changed = list(changed.order_by('updated_at', 'id').values(*BOOKING_SYNC_FIELDS)[:limit + 1])
+
+    deleted = BookingTombstone.objects.filter(deleted_at__lte=settled_before)
+    if tombstone_id is not None:
+        deleted = deleted.filter(id__gt=tombstone_id)
+    elif since:
+        deleted = deleted.filter(deleted_at__gt=since)
+    deleted = list(deleted.order_by('id').values('id', 'booking_id', 'room_id', 'deleted_at')[:limit + 1])
+
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed, deleted = changed[:limit], deleted[:limit]
+
+    # Advance each stream to its last returned row, or to the settle point
+    # when nothing was left to return
+    if changed:
+        updated_at, booking_id = changed[-1]['updated_at'], changed[-1]['id']
+    elif booking_id is None:
+        updated_at = settled_before
+    if deleted:
+        tombstone_id = deleted[-1]['id']
+    elif tombstone_id is None:
+        tombstone_id = BookingTombstone.objects.filter(
+            deleted_at__lte=settled_before
+        ).aggregate(last_id=Max('id'))['last_id'] or 0
+
+    return {
+        'changed': changed,
+        'deleted': [
+            {'booking_id': row['booking_id'], 'room_id': row['room_id'], 'deleted_at': row['deleted_at']}
+            for row in deleted
+        ],
+        'cursor': encode_cursor(updated_at, booking_id, tombstone_id),
+        'has_more': has_more,
+    }
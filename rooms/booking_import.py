@@ -0,0 +1,255 @@
+import logging
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from .models import Booking, Room
+from .availability import availability_index
+from .data_version import bump_data_version, get_data_version, lock_data_version
+from .change_feed import publish_bulk_booking_change
+from .backup_utils import EXCEL_AVAILABLE, get_status_from_display, get_payment_status_from_display
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+logger = logging.getLogger(__name__)
+
+# Rows written per bulk_create/bulk_update statement
+IMPORT_BATCH_SIZE = 1000
+# Rows per transaction when an import reports progress
+IMPORT_CHUNK_SIZE = 5000
+
+REQUIRED_COLUMNS = ['Room Number', 'Guest Name', 'Check In Date', 'Check Out Date', 'Total Amount']
+
+# Columns compared to match an imported row with an existing booking
+NATURAL_KEY = ['room_id', 'guest_name', 'check_in_date', 'check_out_date']
+
+# Fields an import overwrites on a matching booking
+COMPARED_FIELDS = ['guest_contact', 'total_amount', 'paid_amount', 'status', 'payment_status', 'notes']
+UPDATE_FIELDS = COMPARED_FIELDS + ['updated_at']
+
+
+def read_booking_rows(excel_file):
+    """Read the Bookings sheet, keeping text columns as text (room "101" stays "101", not 101.0)"""
+    text_columns = ['Room Number', 'Guest Name', 'Guest Contact', 'Status', 'Payment Status', 'Notes']
+    df = pd.read_excel(excel_file, sheet_name='Bookings', dtype={column: str for column in text_columns})
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns in the Bookings sheet: {', '.join(missing)}")
+    return df
+
+
+def validate_booking_rows(df, rooms_by_number):
+    """
+    Clean and check every row at once. Returns (rows, errors): a frame of the
+    valid rows in model terms, indexed by spreadsheet row number, and one
+    "Row N: ..." message per invalid row.
+    """
+    def text(column, default=''):
+        if column not in df.columns:
+            return pd.Series(default, index=df.index)
+        return df[column].fillna(default).astype(str).str.strip()
+
+    def amount(column):
+        if column not in df.columns:
+            return pd.Series(0.0, index=df.index)
+        return pd.to_numeric(df[column], errors='coerce')
+
+    rows = pd.DataFrame({
+        'room_number': text('Room Number'),
+        'guest_name': text('Guest Name'),
+        'guest_contact': text('Guest Contact'),
+        'check_in_date': pd.to_datetime(df['Check In Date'], errors='coerce'),
+        'check_out_date': pd.to_datetime(df['Check Out Date'], errors='coerce'),
+        'total_amount': amount('Total Amount'),
+        'paid_amount': amount('Paid Amount').fillna(0),
+        'status': text('Status', 'Pencil Booked').map(get_status_from_display),
+        'payment_status': text('Payment Status', 'Unpaid').map(get_payment_status_from_display),
+        'notes': text('Notes'),
+    })
+    # Spreadsheet row numbers: header is row 1
+    rows.index = df.index + 2
+    rows['room_id'] = rows['room_number'].map({number: room.id for number, room in rooms_by_number.items()})
+
+    checks = [
+        (rows['room_id'].isna(), 'Room ' + rows['room_number'] + ' not found'),
+        (rows['guest_name'] == '', 'Guest name is required'),
+        (rows['guest_name'].str.len() > 100, 'Guest name is longer than 100 characters'),
+        (rows['guest_contact'].str.len() > 50, 'Guest contact is longer than 50 characters'),
+        (rows['check_in_date'].isna(), 'Invalid check in date'),
+        (rows['check_out_date'].isna(), 'Invalid check out date'),
+        (rows['check_in_date'] >= rows['check_out_date'], 'Check-out date must be after check-in date'),
+        (rows['total_amount'].isna(), 'Invalid total amount'),
+        (rows['paid_amount'].isna(), 'Invalid paid amount'),
+        (rows[['total_amount', 'paid_amount']].abs().ge(10 ** 8).any(axis=1), 'Amount is too large'),
+    ]
+    # First failing check per row
+    problems = pd.Series(None, index=rows.index, dtype=object)
+    for failed, message in checks:
+        problems = problems.mask(problems.isna() & failed, message)
+
+    invalid = problems.notna()
+    errors = [f"Row {row_number}: {message}" for row_number, message in problems[invalid].items()]
+
+    rows = rows[~invalid].copy()
+    rows['room_id'] = rows['room_id'].astype(int)
+    rows['check_in_date'] = rows['check_in_date'].dt.date
+    rows['check_out_date'] = rows['check_out_date'].dt.date
+    return rows, errors
+
+
+def find_existing_bookings(rows):
+    """
+    Map natural key -> current values (id and COMPARED_FIELDS) of the bookings
+    the rows may update, in one query
+    """
+    if rows.empty:
+        return {}
+    existing = Booking.objects.filter(
+        room_id__in=rows['room_id'].unique().tolist(),
+        check_in_date__gte=rows['check_in_date'].min(),
+        check_in_date__lte=rows['check_in_date'].max(),
+    ).order_by('id').values('id', *NATURAL_KEY, *COMPARED_FIELDS)
+
+    bookings = {}
+    for values in existing:
+        bookings.setdefault(tuple(values[field] for field in NATURAL_KEY), values)
+    return bookings
+
+
+def apply_booking_rows(rows, existing, user, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create or update bookings for validated rows; bookings the row would not
+    change are left alone. Returns (created, updated, unchanged).
+    """
+    now = timezone.now()
+    to_create, to_update = [], []
+    unchanged = 0
+
+    for row in rows.itertuples():
+        current = existing.get((row.room_id, row.guest_name, row.check_in_date, row.check_out_date))
+        booking = Booking(
+            id=current['id'] if current else None,
+            room_id=row.room_id,
+            guest_name=row.guest_name,
+            guest_contact=row.guest_contact,
+            check_in_date=row.check_in_date,
+            check_out_date=row.check_out_date,
+            total_amount=Decimal(f'{row.total_amount:.2f}'),
+            paid_amount=Decimal(f'{row.paid_amount:.2f}'),
+            status=row.status,
+            payment_status=row.payment_status,
+            notes=row.notes,
+            created_by=user,
+            updated_at=now,
+        )
+        # As Booking.save would
+        booking.update_payment_status()
+
+        if current is None:
+            to_create.append(booking)
+        elif any(getattr(booking, field) != current[field] for field in COMPARED_FIELDS):
+            to_update.append(booking)
+        else:
+            unchanged += 1
+
+    Booking.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=batch_size)
+    Booking.objects.bulk_create(to_create, batch_size=batch_size)
+    return len(to_create), len(to_update), unchanged
+
+
+def write_booking_rows(rows, user):
+    """Apply validated rows in one transaction; returns (created, updated, unchanged)"""
+    with transaction.atomic():
+        # Taken before the lookup and held until commit, so a concurrent
+        # import can't create the same bookings in between. On SQLite it
+        # also starts the transaction with a write: one that reads first
+        # fails with "database is locked" when another connection writes.
+        lock_data_version()
+        existing = find_existing_bookings(rows)
+        created, updated, unchanged = apply_booking_rows(rows, existing, user)
+        if created or updated:
+            # Bulk writes bypass the model signals
+            bump_data_version()
+            transaction.on_commit(availability_index.invalidate)
+            transaction.on_commit(
+                lambda: publish_bulk_booking_change(created + updated, get_data_version().version)
+            )
+    return created, updated, unchanged
+
+
+def import_bookings_from_excel(excel_file, user=None, progress=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import bookings from Excel file
+    Rows are validated up front; the valid ones are written in bulk in one
+    transaction, updating bookings with the same room, guest and dates.
+    With a progress(processed, total, error_count) callback the rows are
+    written in chunks of chunk_size instead, one transaction each, and the
+    callback runs after each commit.
+    Returns: dict with success status, message, imported count and per-row errors
+    """
+    if not EXCEL_AVAILABLE or pd is None:
+        return {
+            'success': False,
+            'message': 'Excel libraries not available for import functionality',
+            'imported_count': 0
+        }
+    if user is None:
+        return {
+            'success': False,
+            'message': 'An importing user is required to create bookings',
+            'imported_count': 0
+        }
+
+    try:
+        df = read_booking_rows(excel_file)
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f"Error reading Excel file: {str(e)}",
+            'imported_count': 0
+        }
+
+    rooms_by_number = {room.room_number: room for room in Room.objects.all()}
+    rows, errors = validate_booking_rows(df, rooms_by_number)
+    imported_count = len(rows)
+
+    # A booking listed twice ends up as its last row, as when rows were applied one by one
+    rows = rows.drop_duplicates(subset=NATURAL_KEY, keep='last')
+
+    if progress is None:
+        created, updated, unchanged = write_booking_rows(rows, user)
+    else:
+        created = updated = unchanged = 0
+        progress(0, len(rows), len(errors))
+        for start in range(0, len(rows), chunk_size):
+            chunk_created, chunk_updated, chunk_unchanged = write_booking_rows(rows.iloc[start:start + chunk_size], user)
+            created += chunk_created
+            updated += chunk_updated
+            unchanged += chunk_unchanged
+            progress(min(start + chunk_size, len(rows)), len(rows), len(errors))
+
+    logger.info(
+        f"Imported {imported_count} booking rows: {created} created, {updated} updated, "
+        f"{unchanged} unchanged, {len(errors)} errors"
+    )
+
+    result = {
+        'imported_count': imported_count,
+        'created_count': created,
+        'updated_count': updated,
+        'unchanged_count': unchanged,
+    }
+    if errors:
+        result.update({
+            'success': False,
+            'message': f"Imported {imported_count} bookings with {len(errors)} errors",
+            'errors': errors,
+        })
+    else:
+        result.update({
+            'success': True,
+            'message': f"Successfully imported {imported_count} bookings",
+        })
+    return result
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+import uuid
+import logging
+from collections import deque, namedtuple
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+FeedResult = namedtuple('FeedResult', ['events', 'cursor', 'reset'])
+
+
+class BaseBroadcaster:
+    """
+    Interface of a booking change feed backend.
+
+    Events are dicts carrying a per-stream sequence number ('seq') and a
+    publish timestamp ('published_at'). Clients resume from the last seq
+    they saw on a stream, or from a timestamp when they first connect.
+    """
+
+    def __init__(self):
+        self.stream_id = uuid.uuid4().hex[:12]
+
+    def publish(self, payload):
+        raise NotImplementedError
+
+    def events_after(self, cursor=None, since=None):
+        """Return buffered events after cursor (or published after since) without blocking"""
+        raise NotImplementedError
+
+    def wait(self, cursor=None, since=None, timeout=0):
+        """Blocking variant of events_after for sync (WSGI) long-polling"""
+        raise NotImplementedError
+
+    async def listen(self, cursor=None, since=None, timeout=15):
+        """Awaitable variant of events_after for async (ASGI) streaming"""
+        raise NotImplementedError
+
+
+class InProcessBroadcaster(BaseBroadcaster):
+    """
+    Change feed held in this process' memory: a bounded buffer of recent
+    events plus sync and async waiters. Suitable for a single node; each
+    worker process keeps its own stream, told apart by stream_id.
+    """
+
+    def __init__(self, buffer_size=None):
+        super().__init__()
+        buffer_size = buffer_size or getattr(settings, 'CHANGE_FEED_BUFFER_SIZE', 500)
+        self._events = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._async_waiters = set()
+
+    def publish(self, payload):
+        with self._condition:
+            self._seq += 1
+            event = dict(payload, seq=self._seq, published_at=time.time())
+            self._events.append(event)
+            self._condition.notify_all()
+            waiters = list(self._async_waiters)
+
+        for loop, notified in waiters:
+            try:
+                loop.call_soon_threadsafe(notified.set)
+            except RuntimeError:
+                # Event loop already closed; its listener is gone
+                pass
+        return event
+
+    def events_after(self, cursor=None, since=None):
+        with self._condition:
+            events = list(self._events)
+            latest = self._seq
+
+        if cursor is not None:
+            # Cursor from before a restart, or older than the buffer: the
+            # client has to resynchronise from scratch
+            if cursor > latest or (events and cursor < events[0]['seq'] - 1):
+                return FeedResult([], latest, True)
+            return FeedResult([e for e in events if e['seq'] > cursor], latest, False)
+
+        if since is not None:
+            return FeedResult([e for e in events if e['published_at'] > since], latest, False)
+
+        return FeedResult([], latest, False)
+
+    def wait(self, cursor=None, since=None, timeout=0):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                result = self.events_after(cursor, since)
+                remaining = deadline - time.monotonic()
+                if result.events or result.reset or remaining <= 0:
+                    return result
+                self._condition.wait(remaining)
+
+    async def listen(self, cursor=None, since=None, timeout=15):
+        notified = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), notified)
+
+        # Register before checking so an event published in between isn't missed
+        with self._condition:
+            self._async_waiters.add(waiter)
+        try:
+            result = self.events_after(cursor, since)
+            if result.events or result.reset:
+                return result
+            try:
+                await asyncio.wait_for(notified.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self.events_after(cursor, since)
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """Return the process-wide change feed backend configured by CHANGE_FEED_BACKEND"""
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                backend_path = getattr(settings, 'CHANGE_FEED_BACKEND', 'rooms.change_feed.InProcessBroadcaster')
+                _broadcaster = import_string(backend_path)()
+    return _broadcaster
+
+
+def publish_booking_change(action, booking, version=None):
+    """Publish a booking create/update ('saved') or delete ('deleted') delta"""
+    payload = {
+        'action': action,
+        'version': version,
+        'booking': {
+            'id': booking.id,
+            'room_id': booking.room_id,
+            'check_in': booking.check_in_date.isoformat(),
+            'check_out': booking.check_out_date.isoformat(),
+        },
+    }
+    if action == 'saved':
+        payload['booking'].update({
+            'guest_name': booking.guest_name,
+            'status': booking.status,
+            'color': booking.get_display_color(),
+        })
+
+    try:
+        get_broadcaster().publish(payload)
+    except Exception as e:
+        logger.error(f"Error publishing booking change: {str(e)}")
+
+
+def publish_bulk_booking_change(count, version=None):
+    """
+    Publish that many bookings changed at once (an import), too many for
+    one delta each: clients reload their timeline data instead
+    """
+    try:
+        get_broadcaster().publish({'action': 'bulk', 'version': version, 'count': count})
+    except Exception as e:
+        logger.error(f"Error publishing bulk booking change: {str(e)}")
+
+
+def parse_cursors(value, stream_id):
+    """
+    Pick this stream's cursor out of a 'stream:seq,stream:seq' list. Clients
+    keep one cursor per worker stream because consecutive polls may be
+    answered by different processes.
+    """
+    for part in (value or '').split(','):
+        stream, _, seq = part.partition(':')
+        if stream == stream_id and seq.isdigit():
+            return int(seq)
+    return None
@@ -0,0 +1,53 @@
+import hashlib
+import json
+from django.db.models import F, Count, Max
+from django.utils import timezone
+from .models import DataVersion, Booking, BookingTombstone, Room, RoomType
+
+DATA_VERSION_ID = 1
+
+
+def get_data_version():
+    """Return the current DataVersion row, creating it on first use"""
+    data_version, _ = DataVersion.objects.get_or_create(id=DATA_VERSION_ID)
+    return data_version
+
+
+def bump_data_version():
+    """Increment the shared data version after a booking, room or room type write"""
+    updated = DataVersion.objects.filter(id=DATA_VERSION_ID).update(
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        DataVersion.objects.get_or_create(id=DATA_VERSION_ID, defaults={'version': 1})
+
+
+def lock_data_version():
+    """
+    Hold the data version row until the current transaction ends, so that
+    writers reading bookings before writing them run one at a time. A
+    same-value UPDATE rather than SELECT ... FOR UPDATE: SQLite has no row
+    locks, and this takes its database write lock right away.
+    """
+    locked = DataVersion.objects.filter(id=DATA_VERSION_ID).update(version=F('version'))
+    if not locked:
+        get_data_version()
+        DataVersion.objects.filter(id=DATA_VERSION_ID).update(version=F('version'))
+
+
+def get_data_fingerprint():
+    """
+    Hash of what a backup contains: the data version plus row counts, the
+    latest ids and booking updated_at, and the booking delete counter.
+    The counts and maxima catch bulk writes that bypass the signals bumping
+    the data version. Equal fingerprints mean a new export would be the same.
+    """
+    parts = {
+        'version': get_data_version().version,
+        'bookings': Booking.objects.aggregate(count=Count('id'), last_id=Max('id'), last_updated=Max('updated_at')),
+        'rooms': Room.objects.aggregate(count=Count('id'), last_id=Max('id')),
+        'room_types': RoomType.objects.aggregate(count=Count('id'), last_id=Max('id')),
+        'deletes': BookingTombstone.objects.aggregate(last_id=Max('id'))['last_id'],
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
@@ -0,0 +1,111 @@
+import logging
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import ExportJob, DataBackup
+from .backup_utils import create_backup_record
+from .data_version import get_data_fingerprint
+from .background_jobs import dispatch_job, fail_stale_jobs
+
+logger = logging.getLogger(__name__)
+
+# Exports are MANUAL backups: automatic ones are thinned out by the
+# retention tiers, so a download must not depend on them
+REUSABLE_BACKUP_TYPES = ['MANUAL']
+UNFINISHED_STATUSES = ['PENDING', 'RUNNING']
+
+
+def find_current_export(data_fingerprint):
+    """Latest export taken while the data was as it is now, if any"""
+    return DataBackup.objects.filter(
+        backup_type__in=REUSABLE_BACKUP_TYPES,
+        data_fingerprint=data_fingerprint
+    ).order_by('-created_at').first()
+
+
+def request_export(user):
+    """
+    Returns (backup, job): an existing export of the unchanged data to
+    serve right away, or else the job generating the export (an unfinished
+    one for the same data is joined rather than started again)
+    """
+    data_fingerprint = get_data_fingerprint()
+    backup = find_current_export(data_fingerprint)
+    if backup is not None:
+        return backup, None
+
+    job = ExportJob.objects.filter(data_fingerprint=data_fingerprint, status__in=UNFINISHED_STATUSES).first()
+    if job is not None:
+        return None, job
+
+    try:
+        # The unique constraint on unfinished jobs lets only one request create it
+        with transaction.atomic():
+            job = ExportJob.objects.create(created_by=user, data_fingerprint=data_fingerprint)
+    except IntegrityError:
+        job = ExportJob.objects.filter(data_fingerprint=data_fingerprint, status__in=UNFINISHED_STATUSES).first()
+        if job is None:
+            # The concurrent export already finished
+            return request_export(user)
+        return None, job
+
+    transaction.on_commit(lambda: dispatch_job('process_export_job', job.id))
+    return None, job
+
+
+def run_export_job(job_id):
+    """
+    Export the data once into a MANUAL backup record, which serves as the
+    download. Returns the finished job, or None if another worker took it.
+    """
+    now = timezone.now()
+    claimed = ExportJob.objects.filter(id=job_id, status='PENDING').update(
+        status='RUNNING',
+        started_at=now,
+        heartbeat_at=now
+    )
+    if not claimed:
+        return None
+    job = ExportJob.objects.select_related('created_by').get(id=job_id)
+
+    def heartbeat(rows_written):
+        # A long export must not look like one whose worker is gone
+        ExportJob.objects.filter(id=job_id, status='RUNNING').update(heartbeat_at=timezone.now())
+
+    try:
+        username = job.created_by.username if job.created_by else 'unknown user'
+        backup = create_backup_record(
+            backup_type='MANUAL',
+            user=job.created_by,
+            notes=f'Manual export by {username}',
+            progress=heartbeat
+        )
+        job.status = 'DONE'
+        job.backup = backup
+        job.message = f'Data exported successfully. Backup record created: {backup.file_name}'
+        logger.info(f"Export job {job_id} finished: {backup.file_name}")
+
+    except Exception as e:
+        logger.error(f"Export job {job_id} failed: {str(e)}")
+        job.status = 'FAILED'
+        job.message = f'Error exporting data: {str(e)}'
+
+    job.finished_at = timezone.now()
+    # Only a job still running is finished here: one failed as stale
+    # meanwhile keeps that outcome (its backup is still found by the next
+    # export request)
+    finished = ExportJob.objects.filter(id=job_id, status='RUNNING').update(
+        status=job.status,
+        backup=job.backup,
+        message=job.message,
+        finished_at=job.finished_at
+    )
+    if not finished:
+        logger.warning(f"Export job {job_id} was no longer running when it finished")
+        job.refresh_from_db()
+    return job
+
+
+def fail_stale_export_jobs(jobs=None):
+    """Mark export jobs whose worker is gone as failed (see fail_stale_jobs)"""
+    jobs = ExportJob.objects.all() if jobs is None else jobs
+    return fail_stale_jobs(jobs, 'Export interrupted: the worker running it stopped. Please export again.')
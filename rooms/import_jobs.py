@@ -0,0 +1,120 @@
+import io
+import logging
+from django.db import transaction
+from django.utils import timezone
+from .models import ImportJob, DataBackup
+from .backup_storage import store_backup_file, delete_stored_file
+from .backup_utils import create_backup_record
+from .booking_import import import_bookings_from_excel
+from .background_jobs import dispatch_job, fail_stale_jobs
+
+logger = logging.getLogger(__name__)
+
+# Errors kept on the job for display; error_count has the total
+MAX_JOB_ERRORS = 100
+
+
+def start_import_job(uploaded_file, user):
+    """Keep the upload like a backup file and queue a job to import it once this transaction commits"""
+    job = ImportJob.objects.create(
+        created_by=user,
+        file_name=uploaded_file.name[:255],
+        **store_backup_file(uploaded_file)
+    )
+    transaction.on_commit(lambda: dispatch_job('process_import_job', job.id))
+    return job
+
+
+def discard_import_file(job_id, storage_key):
+    """Drop the upload of a job that ended without a backup taking it over"""
+    ImportJob.objects.filter(id=job_id).update(file_data=None)
+    # Keep a stored file only if a backup or another queued job points at it
+    if storage_key and not (DataBackup.objects.filter(storage_key=storage_key).exists()
+                            or ImportJob.objects.filter(storage_key=storage_key, status__in=['PENDING', 'RUNNING']).exists()):
+        delete_stored_file(storage_key)
+
+
+def run_import_job(job_id):
+    """
+    Import a pending job's file, recording progress as chunks commit.
+    Returns the finished job, or None if another worker already took it.
+    """
+    now = timezone.now()
+    claimed = ImportJob.objects.filter(id=job_id, status='PENDING').update(
+        status='RUNNING',
+        started_at=now,
+        heartbeat_at=now
+    )
+    if not claimed:
+        return None
+    # Deferred by the manager: the file is read once below, not with the job
+    job = ImportJob.objects.select_related('created_by').get(id=job_id)
+
+    def progress(processed, total, error_count):
+        ImportJob.objects.filter(id=job_id).update(
+            processed_rows=processed,
+            total_rows=total,
+            error_count=error_count,
+            heartbeat_at=timezone.now()
+        )
+
+    try:
+        # Read once into memory: the workbook reader seeks around the file,
+        # which a storage backend may not support and which costs a query
+        # per read on a file kept in the database
+        with job.open_file() as stored:
+            excel_file = io.BytesIO(stored.read())
+        result = import_bookings_from_excel(excel_file, job.created_by, progress=progress)
+
+        errors = result.get('errors', [])
+        job.refresh_from_db(fields=['total_rows', 'processed_rows'])
+        job.status = 'DONE' if result['success'] or result['imported_count'] else 'FAILED'
+        job.message = result['message']
+        job.created_count = result.get('created_count', 0)
+        job.updated_count = result.get('updated_count', 0)
+        job.error_count = len(errors)
+        job.errors = errors[:MAX_JOB_ERRORS]
+
+        # Only an import that changed data is worth a backup of its file
+        if job.status == 'DONE':
+            username = job.created_by.username if job.created_by else 'unknown user'
+            job.backup = create_backup_record(
+                backup_type='IMPORT',
+                user=job.created_by,
+                notes=f'Data import by {username}: {result["message"]}',
+                stored_file=job
+            )
+        # The backup holds the file from now on, if there is one
+        job.file_data = None
+        job.finished_at = timezone.now()
+        job.save()
+
+        if job.status == 'FAILED':
+            discard_import_file(job.id, job.storage_key)
+
+        logger.info(f"Import job {job_id} finished: {result['message']}")
+
+    except Exception as e:
+        logger.error(f"Import job {job_id} failed: {str(e)}")
+        ImportJob.objects.filter(id=job_id).update(
+            status='FAILED',
+            message=f'Error importing data: {str(e)}',
+            finished_at=timezone.now()
+        )
+        discard_import_file(job_id, job.storage_key)
+        job.refresh_from_db()
+
+    return job
+
+
+def fail_stale_import_jobs(jobs=None):
+    """Mark import jobs whose worker is gone as failed (see fail_stale_jobs) and drop their uploads"""
+    jobs = ImportJob.objects.all() if jobs is None else jobs
+    failed_ids = fail_stale_jobs(
+        jobs,
+        'Import interrupted: the worker running it stopped. Bookings from chunks that '
+        'finished were kept; upload the file again to import the rest.'
+    )
+    for job_id, storage_key in ImportJob.objects.filter(id__in=failed_ids).values_list('id', 'storage_key'):
+        discard_import_file(job_id, storage_key)
+    return failed_ids
@@ -0,0 +1,181 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rooms.models import Booking, Room, RoomType, CustomUser
+
+BENCHMARK_ROOM_PREFIX = 'BM'
+BENCHMARK_USERNAME = 'index_benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic booking table and compare EXPLAIN output and timings of the '
+        'booking overlap/window queries with and without the Booking indexes. '
+        'Seeded rows are removed afterwards; run against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=100000, help='Number of synthetic bookings to seed')
+        parser.add_argument('--rooms', type=int, default=60, help='Number of synthetic rooms to seed')
+        parser.add_argument('--repeat', type=int, default=200, help='Queries timed per benchmark')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and query parameters')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the benchmark')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f'🗄️  Database vendor: {connection.vendor}')
+
+        room_type, created_room_type = RoomType.objects.get_or_create(name='SINGLE')
+        user, created_user = CustomUser.objects.get_or_create(username=BENCHMARK_USERNAME)
+        dropped_indexes = []
+
+        try:
+            rooms, first_date, last_date = self._seed(room_type, user, options, rng)
+            self._analyze()
+
+            dropped_indexes = self._drop_indexes()
+            before = self._run_benchmarks(rooms, first_date, last_date, options['repeat'], options['seed'], 'WITHOUT indexes')
+
+            self._create_indexes(dropped_indexes)
+            dropped_indexes = []
+            self._analyze()
+            after = self._run_benchmarks(rooms, first_date, last_date, options['repeat'], options['seed'], 'WITH indexes')
+
+            self.stdout.write(self.style.SUCCESS('\n📈 Summary (average per query)'))
+            for name in before:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(
+                    f'   {name}: {before[name] * 1000:.3f} ms → {after[name] * 1000:.3f} ms ({speedup:.1f}x)'
+                )
+
+        finally:
+            # Never leave the table without its indexes
+            if dropped_indexes:
+                self._create_indexes(dropped_indexes)
+            if not options['keep']:
+                self._cleanup(room_type if created_room_type else None, user if created_user else None)
+
+    def _seed(self, room_type, user, options, rng):
+        """Bulk insert synthetic rooms and back-to-back bookings spread over several years"""
+        self.stdout.write(f'🌱 Seeding {options["rooms"]} rooms and {options["bookings"]} bookings...')
+        started = time.perf_counter()
+
+        Room.objects.bulk_create([
+            Room(room_number=f'{BENCHMARK_ROOM_PREFIX}{number:04d}', room_type=room_type)
+            for number in range(options['rooms'])
+        ])
+        # Re-read: bulk_create does not return primary keys on every backend
+        rooms = list(Room.objects.filter(room_number__startswith=BENCHMARK_ROOM_PREFIX))
+
+        first_date = date(2020, 1, 1)
+        next_free = {room.id: first_date for room in rooms}
+        statuses = ['PENCIL', 'CONFIRMED', 'CHECKED_IN', 'NO_SHOW', 'CANCELLED']
+        weights = [20, 50, 10, 10, 10]
+
+        batch = []
+        for number in range(options['bookings']):
+            room = rooms[number % len(rooms)]
+            check_in = next_free[room.id] + timedelta(days=rng.randint(0, 3))
+            check_out = check_in + timedelta(days=rng.randint(1, 7))
+            next_free[room.id] = check_out
+
+            batch.append(Booking(
+                room=room,
+                guest_name=f'Benchmark Guest {number}',
+                check_in_date=check_in,
+                check_out_date=check_out,
+                total_amount=Decimal('1000.00'),
+                status=rng.choices(statuses, weights)[0],
+                created_by=user,
+            ))
+            if len(batch) >= 5000:
+                Booking.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Booking.objects.bulk_create(batch)
+
+        last_date = max(next_free.values())
+        self.stdout.write(f'   Seeded in {time.perf_counter() - started:.1f}s ({first_date} to {last_date})')
+        return rooms, first_date, last_date
+
+    def _run_benchmarks(self, rooms, first_date, last_date, repeat, seed, label):
+        """Print query plans and return the average time of each benchmark query"""
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {label} ==='))
+        span_days = (last_date - first_date).days
+        results = {}
+
+        def overlap_query(rng):
+            check_in = first_date + timedelta(days=rng.randint(0, span_days))
+            return Booking.objects.filter(
+                room=rng.choice(rooms),
+                status__in=Booking.ACTIVE_STATUSES,
+                check_in_date__lt=check_in + timedelta(days=rng.randint(1, 7)),
+                check_out_date__gt=check_in
+            ).values_list('id', flat=True)
+
+        def window_query(rng):
+            start = first_date + timedelta(days=rng.randint(0, span_days))
+            return Booking.objects.filter(
+                check_in_date__lte=start + timedelta(days=13),
+                check_out_date__gte=start
+            ).values_list('id', flat=True)
+
+        for name, build_query in [('overlap check', overlap_query), ('timeline window', window_query)]:
+            rng = random.Random(seed)
+            self.stdout.write(f'\n🔍 {name} plan:')
+            self.stdout.write(build_query(rng).explain())
+
+            # Same parameter sequence for both runs
+            rng = random.Random(seed)
+            queries = [build_query(rng) for _ in range(repeat)]
+            started = time.perf_counter()
+            for query in queries:
+                list(query)
+            results[name] = (time.perf_counter() - started) / max(repeat, 1)
+            self.stdout.write(f'⏱️  {name}: {results[name] * 1000:.3f} ms avg over {repeat} queries')
+
+        return results
+
+    def _drop_indexes(self):
+        indexes = list(Booking._meta.indexes)
+        with connection.schema_editor() as schema_editor:
+            for index in indexes:
+                schema_editor.remove_index(Booking, index)
+        self.stdout.write(f'\n🗑️  Dropped {len(indexes)} Booking indexes')
+        return indexes
+
+    def _create_indexes(self, indexes):
+        with connection.schema_editor() as schema_editor:
+            for index in indexes:
+                schema_editor.add_index(Booking, index)
+        self.stdout.write(f'\n🔧 Recreated {len(indexes)} Booking indexes')
+
+    def _analyze(self):
+        """Refresh planner statistics so the plans reflect the seeded data"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'ANALYZE {Booking._meta.db_table}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    def _cleanup(self, room_type=None, user=None):
+        self.stdout.write('\n🧹 Removing seeded rows...')
+        booking_table = Booking._meta.db_table
+        room_table = Room._meta.db_table
+
+        # Plain SQL so the deletes don't load every booking to fire signals
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {booking_table} WHERE room_id IN '
+                f'(SELECT id FROM {room_table} WHERE room_number LIKE %s)',
+                [f'{BENCHMARK_ROOM_PREFIX}%']
+            )
+            cursor.execute(f'DELETE FROM {room_table} WHERE room_number LIKE %s', [f'{BENCHMARK_ROOM_PREFIX}%'])
+
+        if room_type:
+            room_type.delete()
+        if user:
+            user.delete()
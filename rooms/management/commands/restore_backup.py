@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from rooms.backup_restore import restore_backup
+from rooms.models import CustomUser, DataBackup
+
+
+class Command(BaseCommand):
+    help = (
+        'Restore bookings from a backup. A differential backup is replayed on top '
+        'of its full base backup. Shows what would change unless --yes is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup_id', type=int, help='ID of the backup to restore')
+        parser.add_argument('--user', help='Username credited with bookings whose creator no longer exists')
+        parser.add_argument('--yes', action='store_true', help='Apply the restore instead of only showing the plan')
+
+    def handle(self, *args, **options):
+        backup = DataBackup.objects.filter(id=options['backup_id']).select_related('base_backup').first()
+        if not backup:
+            raise CommandError(f"Backup {options['backup_id']} not found")
+
+        if options['user']:
+            user = CustomUser.objects.filter(username=options['user']).first()
+        else:
+            user = CustomUser.objects.filter(user_type='SUPER').order_by('id').first()
+        if not user:
+            raise CommandError('No user to credit restored bookings to; pass --user')
+
+        result = restore_backup(backup, user, dry_run=not options['yes'])
+
+        self.stdout.write('🔗 Restore chain:')
+        for file_name in result['chain']:
+            self.stdout.write(f'   {file_name}')
+        self.stdout.write(f"📊 Bookings in backup: {result['bookings']}")
+        self.stdout.write(f"   ➕ Created: {result['created']}")
+        self.stdout.write(f"   ✏️  Updated: {result['updated']}")
+        self.stdout.write(f"   🗑️  Deleted: {result['deleted']}")
+
+        if options['yes']:
+            self.stdout.write(self.style.SUCCESS('✅ Restore completed'))
+        else:
+            self.stdout.write(self.style.WARNING('Dry run only, re-run with --yes to apply'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from rooms.backup_utils import create_backup_record, cleanup_old_backups
+from rooms.backup_utils import create_backup_record, create_auto_backup_if_changed
+from rooms.backup_retention import cleanup_old_backups
 from rooms.models import ActivityLog, DataBackup
 from rooms.timezone_utils import now_in_philippines, format_philippine_time
 import logging
@@ -16,14 +17,20 @@ class Command(BaseCommand):
             action='store_true',
             help='Force backup creation even if recent backup exists',
         )
+        parser.add_argument(
+            '--even-if-unchanged',
+            action='store_true',
+            help='Create a backup even if the data is unchanged since the last automatic backup',
+        )
 
     def handle(self, *args, **options):
         try:
             # Check if we should create a backup (every 10 minutes)
             if not options['force']:
-                # Check for recent backups (within last 8 minutes to allow some overlap)
+                # Check for recent backups, full or differential (within
+                # last 8 minutes to allow some overlap)
                 recent_backup = DataBackup.objects.filter(
-                    backup_type='AUTO',
+                    backup_type__in=['AUTO', 'DIFF'],
                     created_at__gte=timezone.now() - timezone.timedelta(minutes=8)
                 ).exists()
                 
@@ -35,10 +42,17 @@ class Command(BaseCommand):
 
             # Create the backup
             ph_now = now_in_philippines()
-            backup = create_backup_record(
-                backup_type='AUTO',
-                notes=f'Automatic backup via command at {ph_now.strftime("%Y-%m-%d %H:%M:%S")} PHT'
-            )
+            notes = f'Automatic backup via command at {ph_now.strftime("%Y-%m-%d %H:%M:%S")} PHT'
+            if options['even_if_unchanged']:
+                backup = create_backup_record(backup_type='AUTO', notes=notes)
+            else:
+                backup, created = create_auto_backup_if_changed(notes=notes)
+                if not created:
+                    self.stdout.write(
+                        self.style.WARNING(f'Data unchanged since {backup.file_name}, skipping...')
+                    )
+                    cleanup_old_backups()
+                    return
             
             # Log the activity
             ActivityLog.objects.create(
@@ -71,7 +85,7 @@ class Command(BaseCommand):
             
             # Show current backup statistics
             total_backups = DataBackup.objects.count()
-            auto_backups = DataBackup.objects.filter(backup_type='AUTO').count()
+            auto_backups = DataBackup.objects.filter(backup_type__in=['AUTO', 'DIFF']).count()
             
             self.stdout.write(f'📈 Current backup stats:')
             self.stdout.write(f'   Total backups: {total_backups}')
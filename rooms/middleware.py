@@ -1,4 +1,4 @@
-from .models import ActivityLog
+from .activity_log import record_activity, get_activity_log_policy
 
 class ActivityLogMiddleware:
     def __init__(self, get_response):
@@ -7,14 +7,15 @@ class ActivityLogMiddleware:
     def __call__(self, request):
         response = self.get_response(request)
 
-        if not request.path.startswith('/admin') and not request.path.startswith('/static'):
+        if get_activity_log_policy().should_log(request.path, request.method):
             user = request.user if request.user.is_authenticated else None
             
             action = f"Viewed {request.path}"
             if request.method == 'POST':
                 action = f"Made a POST request to {request.path}"
 
-            ActivityLog.objects.create(
+            # Queued and written in batches off the request path
+            record_activity(
                 user=user,
                 action=action,
                 ip_address=request.META.get('REMOTE_ADDR'),
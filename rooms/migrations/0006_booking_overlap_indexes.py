@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0005_databackup_databackup_rooms_datab_backup__380b77_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'status', 'check_in_date', 'check_out_date'], name='rooms_booki_room_id_132a2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ['PENCIL', 'CONFIRMED', 'CHECKED_IN'])), fields=['room', 'check_in_date', 'check_out_date'], name='booking_active_overlap_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['check_in_date', 'check_out_date'], name='rooms_booki_check_i_352c90_idx'),
+        ),
+    ]
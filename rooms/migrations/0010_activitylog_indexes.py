@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0009_activitylog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['-timestamp'], name='rooms_activ_timesta_119759_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', '-timestamp'], name='rooms_activ_user_id_ddb4f3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['path', '-timestamp'], name='rooms_activ_path_809001_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-17 11:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0010_activitylog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLogSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('path', models.CharField(max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date', 'path'],
+                'indexes': [models.Index(fields=['date', 'path'], name='rooms_activ_date_5612df_idx'), models.Index(fields=['user', 'date'], name='rooms_activ_user_id_7d4afe_idx')],
+            },
+        ),
+    ]
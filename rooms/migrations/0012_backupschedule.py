@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-17 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0011_activitylogsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_due_at', models.DateTimeField()),
+                ('last_claimed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
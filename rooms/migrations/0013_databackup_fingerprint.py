@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-17 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0012_backupschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databackup',
+            name='data_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='databackup',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
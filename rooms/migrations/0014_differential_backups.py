@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-17 11:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0013_databackup_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databackup',
+            name='base_backup',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='differentials', to='rooms.databackup'),
+        ),
+        migrations.AddField(
+            model_name='databackup',
+            name='data_as_of',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='databackup',
+            name='backup_type',
+            field=models.CharField(choices=[('AUTO', 'Automatic Backup'), ('MANUAL', 'Manual Backup'), ('IMPORT', 'Data Import'), ('DIFF', 'Differential Backup')], default='AUTO', max_length=10),
+        ),
+    ]
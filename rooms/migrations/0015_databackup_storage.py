@@ -0,0 +1,69 @@
+# Generated by Django 4.2.16 on 2026-10-17 11:33
+
+from django.db import migrations, models
+
+
+def move_blobs_to_store(apps, schema_editor):
+    """
+    Fill in size and checksum of each backup, one row in memory at a time.
+    Files move to the backup store only when BACKUP_STORAGE is configured;
+    otherwise they stay in file_data.
+    """
+    import hashlib
+    from rooms.backup_storage import get_backup_store
+
+    DataBackup = apps.get_model('rooms', 'DataBackup')
+    store = get_backup_store()
+    for backup_id in list(DataBackup.objects.filter(storage_key='').values_list('id', flat=True)):
+        file_data = bytes(DataBackup.objects.values_list('file_data', flat=True).get(id=backup_id) or b'')
+        if store is None:
+            DataBackup.objects.filter(id=backup_id).update(
+                file_size=len(file_data),
+                checksum=hashlib.sha256(file_data).hexdigest()
+            )
+        else:
+            key, size, checksum = store.save(file_data)
+            DataBackup.objects.filter(id=backup_id).update(
+                storage_key=key, file_size=size, checksum=checksum, file_data=None
+            )
+
+
+def copy_blobs_back(apps, schema_editor):
+    from rooms.backup_storage import get_backup_store
+
+    DataBackup = apps.get_model('rooms', 'DataBackup')
+    store = get_backup_store()
+    for backup_id, key in list(DataBackup.objects.exclude(storage_key='').values_list('id', 'storage_key')):
+        DataBackup.objects.filter(id=backup_id).update(file_data=store.read(key))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0014_differential_backups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databackup',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='databackup',
+            name='file_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='databackup',
+            name='storage_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        # Null once a backup's file is in the backup store
+        migrations.AlterField(
+            model_name='databackup',
+            name='file_data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(move_blobs_to_store, copy_blobs_back),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0017_export_jobs'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='exportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'RUNNING'])), fields=('data_fingerprint',), name='unique_unfinished_export_per_fingerprint'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0019_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='activitylog',
+            name='rooms_activ_timesta_119759_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='activitylog',
+            name='rooms_activ_path_809001_idx',
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='rooms_activ_timesta_154b21_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['method', '-timestamp'], name='rooms_activ_method_d6e0a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['path'], name='activitylog_path_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0020_activitylog_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='databackup',
+            options={'base_manager_name': 'objects', 'ordering': ['-created_at']},
+        ),
+    ]
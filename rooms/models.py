@@ -73,7 +73,12 @@ class CustomUser(AbstractUser):
     def can_delete_bookings(self):
         return self.user_type == 'ADMIN' or self.user_type == 'SUPER'
 
+# Statuses that hold a room; NO_SHOW and CANCELLED bookings free it up
+ACTIVE_BOOKING_STATUSES = ['PENCIL', 'CONFIRMED', 'CHECKED_IN']
+
 class Booking(models.Model):
+    ACTIVE_STATUSES = ACTIVE_BOOKING_STATUSES
+
     STATUS_CHOICES = [
         ('PENCIL', 'Pencil Booked'),
         ('CONFIRMED', 'Confirmed'),
@@ -142,7 +147,7 @@ class Booking(models.Model):
         # Query for overlapping bookings
         overlapping_bookings = cls.objects.filter(
             room=room,
-            status__in=['PENCIL', 'CONFIRMED', 'CHECKED_IN']  # Only active bookings
+            status__in=cls.ACTIVE_STATUSES  # Only active bookings
         ).filter(
             # Check for date overlap: new booking overlaps with existing if:
             # (new_check_in < existing_check_out) AND (new_check_out > existing_check_in)
@@ -161,6 +166,32 @@ class Booking(models.Model):
     
     class Meta:
         ordering = ['check_in_date', 'room__room_number']
+        indexes = [
+            # Overlap check: room=..., status__in=[...], check_in_date__lt=..., check_out_date__gt=...
+            models.Index(fields=['room', 'status', 'check_in_date', 'check_out_date']),
+            # Same predicate restricted to active bookings (partial index on PostgreSQL/SQLite)
+            models.Index(
+                fields=['room', 'check_in_date', 'check_out_date'],
+                condition=models.Q(status__in=ACTIVE_BOOKING_STATUSES),
+                name='booking_active_overlap_idx',
+            ),
+            # Date-window filters used by the timeline and dashboard
+            models.Index(fields=['check_in_date', 'check_out_date']),
+            # Keyset pagination of incremental "changes since" sync
+            models.Index(fields=['updated_at', 'id']),
+        ]
+
+class BookingTombstone(models.Model):
+    """Trace of a deleted booking so incremental sync clients can see deletions"""
+    booking_id = models.BigIntegerField(db_index=True)
+    room_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"Booking {self.booking_id} deleted at {self.deleted_at}"
+    
+    class Meta:
+        ordering = ['id']
 
 class SystemMemo(models.Model):
     title = models.CharField(max_length=200)
@@ -179,7 +210,7 @@ class SystemMemo(models.Model):
 class ActivityLog(models.Model):
     user = models.ForeignKey(CustomUser, null=True, blank=True, on_delete=models.SET_NULL)
     action = models.CharField(max_length=255)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     path = models.CharField(max_length=255)
     method = models.CharField(max_length=10)
@@ -189,28 +220,106 @@ class ActivityLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pages in (timestamp, id) order, either way
+            models.Index(fields=['timestamp', 'id']),
+            # Newest-first browsing narrowed to a user or a method
+            models.Index(fields=['user', '-timestamp']),
+            models.Index(fields=['method', '-timestamp']),
+            # Path prefix filter (LIKE 'prefix%'); the pattern opclass lets
+            # PostgreSQL use it whatever the database collation
+            models.Index(
+                fields=['path'],
+                opclasses=['varchar_pattern_ops'],
+                name='activitylog_path_prefix_idx',
+            ),
+        ]
+
+class ActivityLogSummary(models.Model):
+    """Daily per-user, per-path rollup of ActivityLog rows past their retention age"""
+    date = models.DateField()
+    user = models.ForeignKey(CustomUser, null=True, blank=True, on_delete=models.SET_NULL)
+    path = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    count = models.PositiveIntegerField(default=0)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.date} {self.user} {self.method} {self.path} x{self.count}"
+
+    class Meta:
+        ordering = ['-date', 'path']
+        indexes = [
+            models.Index(fields=['date', 'path']),
+            models.Index(fields=['user', 'date']),
+        ]
+
+class DataBackupQuerySet(models.QuerySet):
+    LISTING_FIELDS = [
+        'backup_type', 'created_at', 'created_by__username', 'file_name', 'file_size',
+        'booking_count', 'notes', 'verified_at',
+    ]
+    
+    def for_listing(self):
+        """Only the columns the backup list shows, with the creator joined in"""
+        return self.select_related('created_by').only(*self.LISTING_FIELDS)
+    
+    def type_counts(self):
+        """Total and per-type backup counts in one query"""
+        return self.aggregate(
+            total=models.Count('id'),
+            **{
+                code.lower(): models.Count('id', filter=models.Q(backup_type=code))
+                for code, _ in DataBackup.BACKUP_TYPE_CHOICES
+            }
+        )
+
+class DataBackupManager(models.Manager.from_queryset(DataBackupQuerySet)):
+    def get_queryset(self):
+        # The file is only read when it is downloaded or restored
+        return super().get_queryset().defer('file_data')
 
 class DataBackup(models.Model):
     BACKUP_TYPE_CHOICES = [
         ('AUTO', 'Automatic Backup'),
         ('MANUAL', 'Manual Backup'),
         ('IMPORT', 'Data Import'),
+        ('DIFF', 'Differential Backup'),
     ]
     
     backup_type = models.CharField(max_length=10, choices=BACKUP_TYPE_CHOICES, default='AUTO')
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(CustomUser, null=True, blank=True, on_delete=models.SET_NULL)
     file_name = models.CharField(max_length=255)
-    file_data = models.BinaryField()  # Store Excel file data
+    # The file is in the backup store under storage_key when BACKUP_STORAGE
+    # is set, otherwise in file_data (see rooms.backup_storage)
+    file_data = models.BinaryField(null=True)
+    storage_key = models.CharField(max_length=255, blank=True)
+    file_size = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, db_index=True)
     booking_count = models.IntegerField(default=0)
     room_count = models.IntegerField(default=0)
     notes = models.TextField(blank=True)
+    # Data fingerprint at export time; an automatic backup is skipped while it
+    # still matches, and verified_at records the last such check
+    data_fingerprint = models.CharField(max_length=64, blank=True)
+    verified_at = models.DateTimeField(null=True, blank=True)
+    # When the exported data was read. A differential backup holds the
+    # bookings changed or deleted since its full base_backup's data_as_of
+    data_as_of = models.DateTimeField(null=True, blank=True)
+    base_backup = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='differentials')
+    
+    objects = DataBackupManager()
     
     def __str__(self):
         return f"{self.get_backup_type_display()} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
     
     class Meta:
         ordering = ['-created_at']
+        # Related lookups and delete cascades (which fetch whole rows, as
+        # there is a post_delete handler) leave file_data deferred too
+        base_manager_name = 'objects'
         indexes = [
             models.Index(fields=['backup_type', '-created_at']),
             models.Index(fields=['-created_at']),
@@ -218,6 +327,136 @@ class DataBackup(models.Model):
     
     def get_file_size(self):
         """Get file size in KB"""
-        if self.file_data:
-            return len(self.file_data) / 1024
-        return 0
\ No newline at end of file
+        return self.file_size / 1024
+    
+    def open_file(self):
+        """Open the backup file for streaming reads"""
+        from .backup_storage import open_stored_file
+        return open_stored_file(self)
+    
+    def read_file(self):
+        """Return the whole backup file as bytes"""
+        with self.open_file() as f:
+            return f.read()
+
+class ImportJobManager(models.Manager):
+    def get_queryset(self):
+        # The upload is only read by the job importing it
+        return super().get_queryset().defer('file_data')
+
+class ImportJob(models.Model):
+    """
+    Excel import running in the background. The uploaded file is kept like
+    a backup file and becomes the IMPORT backup once the rows are applied.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    created_by = models.ForeignKey(CustomUser, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life from the worker; see rooms.background_jobs.fail_stale_jobs
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    file_data = models.BinaryField(null=True)
+    storage_key = models.CharField(max_length=255, blank=True)
+    file_size = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    # The first errors only; error_count has the total
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    backup = models.ForeignKey(DataBackup, null=True, blank=True, on_delete=models.SET_NULL)
+    
+    objects = ImportJobManager()
+    
+    def __str__(self):
+        return f"Import {self.file_name} ({self.get_status_display()})"
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def is_finished(self):
+        return self.status in ('DONE', 'FAILED')
+    
+    def open_file(self):
+        """Open the uploaded file for reading"""
+        from .backup_storage import open_stored_file
+        return open_stored_file(self)
+    
+    def get_progress_percent(self):
+        if self.status == 'DONE':
+            return 100
+        if not self.total_rows:
+            return 0
+        return int(self.processed_rows * 100 / self.total_rows)
+
+class ExportJob(models.Model):
+    """
+    Full export generated in the background. Its result is a MANUAL backup,
+    which is also what the user downloads.
+    """
+    STATUS_CHOICES = ImportJob.STATUS_CHOICES
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    created_by = models.ForeignKey(CustomUser, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Data fingerprint when requested; a second request for unchanged data joins this job
+    data_fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    message = models.TextField(blank=True)
+    backup = models.ForeignKey(DataBackup, null=True, blank=True, on_delete=models.SET_NULL)
+    
+    def __str__(self):
+        return f"Export {self.created_at.strftime('%Y-%m-%d %H:%M')} ({self.get_status_display()})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # One unfinished export per data state; concurrent requests join it
+            models.UniqueConstraint(
+                fields=['data_fingerprint'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING']),
+                name='unique_unfinished_export_per_fingerprint'
+            ),
+        ]
+    
+    def is_finished(self):
+        return self.status in ('DONE', 'FAILED')
+
+class BackupSchedule(models.Model):
+    """
+    Next due time of a recurring backup, shared by all worker processes.
+    A worker claims a due run by moving next_due_at forward with a
+    conditional UPDATE, so only one of them starts the backup.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_due_at = models.DateTimeField()
+    last_claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} backup due {self.next_due_at}"
+
+class DataVersion(models.Model):
+    """
+    Single-row counter bumped on every Booking/Room/RoomType write.
+    Shared by all worker processes, so clients can cheaply tell whether
+    anything changed since they last looked.
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Data version {self.version} ({self.updated_at})"
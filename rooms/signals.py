@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Booking, BookingTombstone, DataBackup, ImportJob, Room, RoomType
+from .availability import availability_index
+from .data_version import bump_data_version, get_data_version
+from .change_feed import publish_booking_change
+from .backup_storage import delete_stored_file
+
+
+@receiver(post_save, sender=Booking)
+def index_saved_booking(sender, instance, **kwargs):
+    """Keep the availability index in step with committed booking changes"""
+    transaction.on_commit(lambda: availability_index.update_booking(instance))
+
+
+@receiver(post_delete, sender=Booking)
+def unindex_deleted_booking(sender, instance, **kwargs):
+    """Drop deleted bookings from the availability index once committed"""
+    booking_id = instance.id
+    transaction.on_commit(lambda: availability_index.remove_booking(booking_id))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def bump_version_on_write(sender, **kwargs):
+    """Any write to timeline data invalidates cached timelines and ETags"""
+    bump_data_version()
+
+
+@receiver(post_save, sender=Booking)
+def publish_saved_booking(sender, instance, **kwargs):
+    """Push the booking delta to open timelines once committed"""
+    transaction.on_commit(lambda: publish_booking_change('saved', instance, get_data_version().version))
+
+
+@receiver(post_delete, sender=Booking)
+def publish_deleted_booking(sender, instance, **kwargs):
+    """Push booking deletions to open timelines once committed"""
+    # Copied now: inside an outer atomic() the delete has cleared instance.id
+    # by the time on_commit callbacks run
+    booking = Booking(
+        id=instance.id,
+        room_id=instance.room_id,
+        check_in_date=instance.check_in_date,
+        check_out_date=instance.check_out_date,
+    )
+    transaction.on_commit(lambda: publish_booking_change('deleted', booking, get_data_version().version))
+
+
+@receiver(post_delete, sender=Booking)
+def record_booking_tombstone(sender, instance, **kwargs):
+    """Leave a trace of deleted bookings for incremental sync (see booking_changes)"""
+    BookingTombstone.objects.create(booking_id=instance.id, room_id=instance.room_id)
+
+
+@receiver(post_delete, sender=DataBackup)
+def delete_unreferenced_backup_file(sender, instance, **kwargs):
+    """Remove a backup's stored file once no other backup or queued import shares it"""
+    storage_key = instance.storage_key
+
+    def delete_file():
+        if not storage_key or DataBackup.objects.filter(storage_key=storage_key).exists():
+            return
+        if ImportJob.objects.filter(storage_key=storage_key, status__in=['PENDING', 'RUNNING']).exists():
+            return
+        delete_stored_file(storage_key)
+
+    transaction.on_commit(delete_file)
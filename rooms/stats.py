@@ -0,0 +1,89 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Count, Sum, Value, F, Func, DateField, DecimalField, IntegerField
+from django.db.models.functions import Greatest, Least, NullIf
+from .models import Booking, Room
+
+
+class NightsBetween(Func):
+    """Whole days from the start date expression to the end one, as an integer"""
+    arity = 2
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = IntegerField()
+
+    def __init__(self, start, end, **extra):
+        # Rendered as end - start
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite stores dates as text: subtract their julian day numbers
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+class ProRata(Func):
+    """amount * part / whole, computed in the decimal type of amount"""
+    arity = 3
+    template = '(%(amount)s * %(part)s / %(whole)s)'
+    output_field = DecimalField(max_digits=14, decimal_places=2)
+
+    def as_sql(self, compiler, connection, template=None, **extra_context):
+        sql_parts, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sql_parts.append(sql)
+            params.extend(expression_params)
+        amount, part, whole = sql_parts
+        return (template or self.template) % {'amount': amount, 'part': part, 'whole': whole}, params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite has no decimal type and keeps whole amounts as integers,
+        # which would make this an integer division
+        return self.as_sql(compiler, connection, template='(CAST(%(amount)s AS REAL) * %(part)s / %(whole)s)')
+
+
+def booking_window_stats(start_date, end_date):
+    """
+    Reservation stats for start_date..end_date (inclusive), computed by the
+    database in two aggregate queries without loading booking rows.
+
+    Only active bookings count. Room-nights and revenue are clipped to the
+    window: a stay crossing an edge contributes only the nights inside it,
+    and its revenue pro rata for those nights.
+    """
+    window_start = Value(start_date, output_field=DateField())
+    window_end = Value(end_date + timedelta(days=1), output_field=DateField())
+    days = (end_date - start_date).days + 1
+
+    nights_in_window = NightsBetween(
+        Greatest(F('check_in_date'), window_start),
+        Least(F('check_out_date'), window_end)
+    )
+    stay_nights = NullIf(NightsBetween(F('check_in_date'), F('check_out_date')), Value(0))
+
+    totals = Booking.objects.filter(
+        status__in=Booking.ACTIVE_STATUSES,
+        check_in_date__lte=end_date,
+        check_out_date__gt=start_date
+    ).aggregate(
+        total_bookings=Count('id'),
+        room_nights=Sum(nights_in_window),
+        total_revenue=Sum(ProRata(F('total_amount'), nights_in_window, stay_nights)),
+    )
+
+    total_rooms = Room.objects.filter(is_active=True).count()
+    room_nights = totals['room_nights'] or 0
+    available_room_nights = total_rooms * days
+
+    return {
+        'total_bookings': totals['total_bookings'],
+        'room_nights': room_nights,
+        'available_room_nights': available_room_nights,
+        'occupancy_rate': round((room_nights / available_room_nights * 100) if available_room_nights > 0 else 0, 1),
+        'total_revenue': (totals['total_revenue'] or Decimal('0')).quantize(Decimal('0.01')),
+    }
@@ -4,11 +4,17 @@ except ImportError:
     # Celery not available, create a dummy decorator
     def shared_task(func):
         return func
+from django.db.models import Q
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 import logging
-from .backup_utils import create_backup_record, cleanup_old_backups
+from .backup_utils import create_auto_backup_if_changed
+from .backup_scheduler import claim_due_backup, reschedule_backup
+from .backup_retention import cleanup_old_backups
+from .activity_log import compact_activity_logs
+from .import_jobs import run_import_job, fail_stale_import_jobs
+from .export_jobs import run_export_job, fail_stale_export_jobs
 from .models import ActivityLog
 
 logger = logging.getLogger(__name__)
@@ -20,13 +26,33 @@ def create_automatic_backup():
     Create automatic backup every 10 minutes
     This task is scheduled to run every 10 minutes
     """
+    # Claimed on the schedule shared with the request trigger and the
+    # scheduler thread, so only one of them makes each backup. Beat fires
+    # on its own clock, so a run due within a minute counts as due.
+    claimed, next_due_at = claim_due_backup(grace_seconds=60)
+    if not claimed:
+        logger.info(f"Automatic backup not due until {next_due_at}, skipped")
+        return {
+            'success': True,
+            'skipped': True,
+            'next_due_at': next_due_at.isoformat()
+        }
+
     try:
-        # Create the backup
-        backup = create_backup_record(
-            backup_type='AUTO',
+        # Create the backup, unless nothing changed since the last one
+        backup, created = create_auto_backup_if_changed(
             notes=f'Automatic backup created at {timezone.now().strftime("%Y-%m-%d %H:%M:%S")}'
         )
         
+        if not created:
+            logger.info(f"Data unchanged since {backup.file_name}, automatic backup skipped")
+            return {
+                'success': True,
+                'skipped': True,
+                'backup_id': backup.id,
+                'file_name': backup.file_name
+            }
+        
         # Log the activity
         ActivityLog.objects.create(
             action=f'Automatic backup created: {backup.file_name}',
@@ -46,6 +72,8 @@ def create_automatic_backup():
         
     except Exception as e:
         logger.error(f"Error creating automatic backup: {str(e)}")
+        # Let the next beat retry rather than wait a whole interval
+        reschedule_backup(0)
         
         # Log the error
         ActivityLog.objects.create(
@@ -65,7 +93,7 @@ def create_automatic_backup():
 def cleanup_old_backup_files():
     """
     Clean up old backup files every hour
-    Remove automatic backups older than 24 hours (keeping 144 backups max)
+    Thin out automatic backups by age following BACKUP_RETENTION_TIERS
     """
     try:
         deleted_count = cleanup_old_backups()
@@ -111,10 +139,13 @@ def backup_system_health_check():
     try:
         from .models import DataBackup
         
-        # Check if we have recent backups (within last hour)
+        # Check if we have recent backups (within last hour), full or
+        # differential. A backup re-verified because the data was unchanged
+        # counts as recent too.
+        since = timezone.now() - timezone.timedelta(hours=1)
         recent_backups = DataBackup.objects.filter(
-            backup_type='AUTO',
-            created_at__gte=timezone.now() - timezone.timedelta(hours=1)
+            Q(created_at__gte=since) | Q(verified_at__gte=since),
+            backup_type__in=['AUTO', 'DIFF']
         ).count()
         
         if recent_backups == 0:
@@ -135,8 +166,9 @@ def backup_system_health_check():
             }
         
         # System is healthy
-        total_backups = DataBackup.objects.count()
-        auto_backups = DataBackup.objects.filter(backup_type='AUTO').count()
+        counts = DataBackup.objects.type_counts()
+        total_backups = counts['total']
+        auto_backups = counts['auto']
         
         ActivityLog.objects.create(
             action=f'Backup system health check passed: {recent_backups} recent, {total_backups} total backups',
@@ -157,4 +189,121 @@ def backup_system_health_check():
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+
+@shared_task
+def compact_activity_log():
+    """
+    Daily activity log compaction
+    Roll raw rows past ACTIVITY_LOG_RETENTION_DAYS into daily summaries and delete them in batches
+    """
+    try:
+        compacted, batches = compact_activity_logs()
+        
+        ActivityLog.objects.create(
+            action=f'Activity log compaction completed: {compacted} rows summarised in {batches} batches',
+            timestamp=timezone.now(),
+            path='/activity-log/compact',
+            method='TASK'
+        )
+        
+        logger.info(f"Activity log compaction completed: {compacted} rows in {batches} batches")
+        
+        return {
+            'success': True,
+            'compacted': compacted,
+            'batches': batches
+        }
+        
+    except Exception as e:
+        logger.error(f"Error during activity log compaction: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@shared_task
+def process_import_job(job_id):
+    """
+    Run a queued Excel import job
+    Queued by rooms.import_jobs.start_import_job through rooms.background_jobs.dispatch_job
+    """
+    try:
+        job = run_import_job(job_id)
+        
+        if job is None:
+            return {
+                'success': True,
+                'skipped': True,
+                'job_id': job_id
+            }
+        
+        return {
+            'success': job.status == 'DONE',
+            'job_id': job_id,
+            'message': job.message
+        }
+        
+    except Exception as e:
+        logger.error(f"Error processing import job {job_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@shared_task
+def process_export_job(job_id):
+    """
+    Generate a requested export
+    Queued by rooms.export_jobs.request_export through rooms.background_jobs.dispatch_job
+    """
+    try:
+        job = run_export_job(job_id)
+        
+        if job is None:
+            return {
+                'success': True,
+                'skipped': True,
+                'job_id': job_id
+            }
+        
+        return {
+            'success': job.status == 'DONE',
+            'job_id': job_id,
+            'backup_id': job.backup_id,
+            'message': job.message
+        }
+        
+    except Exception as e:
+        logger.error(f"Error processing export job {job_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@shared_task
+def fail_stale_background_jobs():
+    """
+    Fail import and export jobs whose worker stopped every 10 minutes
+    Their pages would otherwise poll a RUNNING job forever
+    """
+    try:
+        import_ids = fail_stale_import_jobs()
+        export_ids = fail_stale_export_jobs()
+        
+        return {
+            'success': True,
+            'import_jobs': import_ids,
+            'export_jobs': export_ids
+        }
+        
+    except Exception as e:
+        logger.error(f"Error failing stale background jobs: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
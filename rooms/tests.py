@@ -1,3 +1,714 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import (
+    ActivityLog, ActivityLogSummary, BackupSchedule, Booking, CustomUser, DataBackup, ExportJob, ImportJob, Room,
+    RoomType
+)
+from . import backup_storage
+from .activity_log import (
+    ActivityLogBuffer, ActivityLogPolicy, compact_activity_logs, page_activity_logs, record_activity
+)
+from .availability import AvailabilityIndex, find_available_rooms
+from .background_jobs import get_job_executor
+from .backup_restore import get_restore_chain, restore_backup
+from .backup_retention import cleanup_old_backups, select_backups_to_delete
+from .backup_scheduler import claim_due_backup
+from .backup_utils import (
+    EXCEL_AVAILABLE, create_auto_backup_if_changed, create_backup_record, get_last_full_backup, parse_byte_range
+)
+from .booking_changes import get_booking_changes
+from .booking_import import validate_booking_rows, write_booking_rows
+from .change_feed import get_broadcaster
+from .data_version import get_data_fingerprint
+from .export_jobs import request_export, run_export_job
+from .import_jobs import fail_stale_import_jobs, run_import_job
+from .stats import booking_window_stats
+from .tasks import backup_system_health_check, create_automatic_backup
+from .timeline import build_timeline, build_timeline_rows, layout_bar
 
-# Create your tests here.
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+class BookingFixtureMixin:
+    """Rooms, a user and a helper to book them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='frontdesk', user_type='SUPER')
+        cls.room_type = RoomType.objects.create(
+            name='STUDIO_A', base_weekday_rate=Decimal('1000'), base_weekend_rate=Decimal('1200')
+        )
+        cls.room = Room.objects.create(room_number='101', room_type=cls.room_type)
+        cls.other_room = Room.objects.create(room_number='102', room_type=cls.room_type)
+
+    def book(self, room, check_in, check_out, **fields):
+        fields.setdefault('guest_name', 'Guest')
+        fields.setdefault('total_amount', Decimal('1000'))
+        fields.setdefault('status', 'CONFIRMED')
+        return Booking.objects.create(
+            room=room, check_in_date=check_in, check_out_date=check_out, created_by=self.user, **fields
+        )
+
+
+class AvailabilityTests(BookingFixtureMixin, TestCase):
+
+    def conflict_ids(self, index, check_in, check_out, **kwargs):
+        return [interval.id for interval in index.find_conflicts(self.room.id, check_in, check_out, **kwargs)]
+
+    def test_index_finds_overlapping_active_bookings(self):
+        long_stay = self.book(self.room, date(2025, 1, 1), date(2025, 2, 1))
+        self.book(self.room, date(2025, 3, 1), date(2025, 3, 5))
+        self.book(self.room, date(2025, 3, 10), date(2025, 3, 12), status='CANCELLED')
+        index = AvailabilityIndex()
+
+        # Found although it starts a month before the checked range
+        self.assertEqual(self.conflict_ids(index, date(2025, 1, 30), date(2025, 2, 2)), [long_stay.id])
+        self.assertEqual(self.conflict_ids(index, date(2025, 3, 5), date(2025, 3, 8)), [])
+        self.assertEqual(self.conflict_ids(index, date(2025, 3, 10), date(2025, 3, 12)), [])
+        self.assertEqual(
+            self.conflict_ids(index, date(2025, 1, 30), date(2025, 2, 2), exclude_booking_id=long_stay.id), []
+        )
+
+    def test_index_follows_booking_changes(self):
+        index = AvailabilityIndex()
+        self.assertEqual(self.conflict_ids(index, date(2025, 4, 1), date(2025, 4, 3)), [])
+
+        booking = self.book(self.room, date(2025, 4, 2), date(2025, 4, 4))
+        index.update_booking(booking)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.conflict_ids(index, date(2025, 4, 1), date(2025, 4, 3)), [booking.id])
+
+        booking.status = 'CANCELLED'
+        index.update_booking(booking)
+        self.assertEqual(self.conflict_ids(index, date(2025, 4, 1), date(2025, 4, 3)), [])
+
+    def test_free_rooms_are_found_in_one_query(self):
+        Room.objects.create(room_number='103', room_type=self.room_type, is_active=False)
+        self.book(self.room, date(2025, 4, 1), date(2025, 4, 5))
+        self.book(self.other_room, date(2025, 4, 1), date(2025, 4, 5), status='CANCELLED')
+
+        with self.assertNumQueries(1):
+            rooms = list(find_available_rooms(date(2025, 4, 3), date(2025, 4, 4)))
+        self.assertEqual(rooms, [self.other_room])
+        self.assertEqual(list(find_available_rooms(date(2025, 4, 5), date(2025, 4, 6))), [self.room, self.other_room])
+
+
+class TimelineTests(BookingFixtureMixin, TestCase):
+
+    def test_build_timeline_runs_three_queries_however_much_data(self):
+        start_date, end_date = date(2025, 3, 1), date(2025, 3, 14)
+        self.book(self.room, date(2025, 3, 2), date(2025, 3, 4))
+        with self.assertNumQueries(3):
+            build_timeline(start_date, end_date)
+
+        room_type = RoomType.objects.create(name='DOUBLE')
+        for number in range(201, 211):
+            room = Room.objects.create(room_number=str(number), room_type=room_type)
+            self.book(room, date(2025, 2, 27), date(2025, 3, 5))
+            self.book(room, date(2025, 3, 8), date(2025, 3, 10))
+
+        with self.assertNumQueries(3):
+            timeline = build_timeline(start_date, end_date)
+        # DOUBLE sorts before STUDIO_A
+        self.assertEqual([len(group['rooms']) for group in timeline['timeline_data']], [10, 2])
+
+    def test_layout_bar_clips_stays_at_window_edges(self):
+        start_date = date(2025, 3, 10)
+
+        def layout(check_in, check_out):
+            bar = layout_bar({'check_in': check_in, 'check_out': check_out}, start_date, 7)
+            return bar['offset'], bar['span'], bar['clipped_start'], bar['clipped_end']
+
+        self.assertEqual(layout(date(2025, 3, 12), date(2025, 3, 14)), (2, 2, False, False))
+        self.assertEqual(layout(date(2025, 3, 8), date(2025, 3, 20)), (0, 7, True, True))
+        self.assertEqual(layout(date(2025, 3, 15), date(2025, 3, 18)), (5, 2, False, True))
+        # Checks out on the first day: no night in the window
+        self.assertEqual(layout(date(2025, 3, 8), date(2025, 3, 10))[1], 0)
+
+    def test_timeline_rows_load_only_the_drawn_booking_fields(self):
+        booking = self.book(self.room, date(2025, 3, 2), date(2025, 3, 4), notes='Late arrival')
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = build_timeline_rows(date(2025, 3, 1), date(2025, 3, 31), room_type_id=self.room_type.id)
+
+        self.assertEqual(len(queries), 2)
+        for column in ('notes', 'guest_contact', 'total_amount'):
+            self.assertNotIn(f'"{column}"', queries[1]['sql'])
+        self.assertEqual([row['room_number'] for row in rows], ['101', '102'])
+        self.assertEqual([bar['id'] for bar in rows[0]['bars']], [booking.id])
+        self.assertEqual(rows[1]['bars'], [])
+
+
+class TimelineDataTests(BookingFixtureMixin, TestCase):
+
+    def test_unchanged_data_answers_not_modified(self):
+        self.client.force_login(self.user)
+        url = reverse('timeline_data') + '?start_date=2025-03-01&days=14'
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.book(self.room, date(2025, 3, 2), date(2025, 3, 4))
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(changed.json()['version'], first.json()['version'] + 1)
+
+    def test_pollers_can_skip_rows_and_stats(self):
+        self.client.force_login(self.user)
+        self.book(self.room, date(2025, 3, 2), date(2025, 3, 4))
+        url = reverse('timeline_data') + '?start_date=2025-03-01&days=14'
+
+        with CaptureQueriesContext(connection) as queries:
+            version_only = self.client.get(url + '&only=version')
+        self.assertEqual(set(version_only.json()), {'success', 'version', 'start_date', 'days'})
+        self.assertFalse([query for query in queries if 'rooms_booking' in query['sql']])
+
+        stats_only = self.client.get(url + '&only=stats').json()
+        self.assertNotIn('rows', stats_only)
+        self.assertEqual(stats_only['stats']['room_nights'], 2)
+        # A different body under the same data version gets its own ETag
+        self.assertNotEqual(version_only['ETag'], self.client.get(url)['ETag'])
+
+
+class ChangeFeedTests(BookingFixtureMixin, TestCase):
+
+    def test_delete_inside_atomic_publishes_booking_id(self):
+        booking = self.book(self.room, date(2025, 3, 1), date(2025, 3, 3))
+        broadcaster = get_broadcaster()
+        cursor = broadcaster.events_after().cursor
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Booking.objects.filter(id=booking.id).delete()
+
+        events = [e for e in broadcaster.events_after(cursor).events if e['action'] == 'deleted']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['booking']['id'], booking.id)
+        self.assertEqual(events[0]['booking']['room_id'], self.room.id)
+        self.assertEqual(events[0]['booking']['check_in'], '2025-03-01')
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0)
+class BookingChangesTests(BookingFixtureMixin, TestCase):
+
+    def test_cursor_pages_changes_then_deletions(self):
+        bookings = [self.book(self.room, date(2025, 5, day), date(2025, 5, day + 1)) for day in (1, 2, 3)]
+
+        first = get_booking_changes(limit=2)
+        self.assertEqual([row['id'] for row in first['changed']], [bookings[0].id, bookings[1].id])
+        self.assertTrue(first['has_more'])
+
+        second = get_booking_changes(first['cursor'], limit=2)
+        self.assertEqual([row['id'] for row in second['changed']], [bookings[2].id])
+        self.assertFalse(second['has_more'])
+
+        deleted_id = bookings[0].id
+        bookings[0].delete()
+        third = get_booking_changes(second['cursor'])
+        self.assertEqual(third['changed'], [])
+        self.assertEqual([row['booking_id'] for row in third['deleted']], [deleted_id])
+
+        self.assertEqual(get_booking_changes(third['cursor'])['deleted'], [])
+
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            get_booking_changes('not-a-cursor')
+
+
+class BookingWindowStatsTests(BookingFixtureMixin, TestCase):
+
+    def test_revenue_is_prorated_in_decimal(self):
+        # 1000 over three nights, one of them inside the window
+        self.book(self.room, date(2025, 3, 1), date(2025, 3, 4))
+        self.book(self.other_room, date(2025, 3, 3), date(2025, 3, 4), total_amount=Decimal('0.10'))
+
+        stats = booking_window_stats(date(2025, 3, 3), date(2025, 3, 3))
+
+        self.assertEqual(stats['room_nights'], 2)
+        self.assertIsInstance(stats['total_revenue'], Decimal)
+        self.assertEqual(stats['total_revenue'], Decimal('333.43'))
+
+
+class ActivityLogBufferTests(TestCase):
+
+    def setUp(self):
+        # Flushed by hand here rather than by the flusher thread
+        patcher = mock.patch.object(ActivityLogBuffer, '_ensure_started')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def entry(self, path='/timeline/'):
+        return ActivityLog(action=f'Viewed {path}', path=path, method='GET')
+
+    def test_flush_writes_queued_entries_in_batches(self):
+        buffer = ActivityLogBuffer(batch_size=2)
+        for path in ('/a/', '/b/', '/c/'):
+            buffer.add(self.entry(path))
+        self.assertFalse(ActivityLog.objects.exists())
+
+        with self.assertNumQueries(2):
+            self.assertEqual(buffer.flush(), 3)
+        self.assertCountEqual(ActivityLog.objects.values_list('path', flat=True), ['/a/', '/b/', '/c/'])
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_full_queue_drops_entries(self):
+        buffer = ActivityLogBuffer(max_size=1)
+        buffer.add(self.entry())
+        buffer.add(self.entry())
+        self.assertEqual(buffer.dropped, 1)
+        self.assertEqual(buffer.flush(), 1)
+
+    def test_stop_writes_what_is_left(self):
+        # What atexit runs when a worker shuts down
+        buffer = ActivityLogBuffer()
+        buffer.add(self.entry('/a/'))
+        buffer.add(self.entry('/b/'))
+        buffer.stop()
+        self.assertEqual(ActivityLog.objects.count(), 2)
+
+    def test_record_activity_is_buffered_unless_sync(self):
+        buffer = ActivityLogBuffer()
+        with mock.patch('rooms.activity_log.get_activity_log_buffer', return_value=buffer):
+            with override_settings(ACTIVITY_LOG_SYNC=False):
+                record_activity(action='Viewed /a/', path='/a/', method='GET')
+            self.assertFalse(ActivityLog.objects.exists())
+
+            with override_settings(ACTIVITY_LOG_SYNC=True):
+                record_activity(action='Viewed /b/', path='/b/', method='GET')
+            self.assertEqual(list(ActivityLog.objects.values_list('path', flat=True)), ['/b/'])
+
+        buffer.flush()
+        self.assertEqual(ActivityLog.objects.count(), 2)
+
+
+class ActivityLogTests(TestCase):
+
+    def log(self, minutes_ago, **fields):
+        fields.setdefault('path', '/timeline/')
+        return ActivityLog.objects.create(
+            action='GET /timeline/', method='GET', timestamp=self.now - timedelta(minutes=minutes_ago), **fields
+        )
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def test_keyset_pages_walk_both_ways(self):
+        logs = [self.log(minutes_ago) for minutes_ago in range(5)]
+        all_logs = ActivityLog.objects.all()
+
+        first = page_activity_logs(all_logs, limit=2)
+        self.assertEqual(first['logs'], logs[:2])
+        self.assertIsNone(first['newer_cursor'])
+
+        second = page_activity_logs(all_logs, before=first['older_cursor'], limit=2)
+        self.assertEqual(second['logs'], logs[2:4])
+
+        last = page_activity_logs(all_logs, before=second['older_cursor'], limit=2)
+        self.assertEqual(last['logs'], logs[4:])
+        self.assertIsNone(last['older_cursor'])
+
+        back = page_activity_logs(all_logs, after=second['newer_cursor'], limit=2)
+        self.assertEqual(back['logs'], logs[:2])
+        self.assertIsNone(back['newer_cursor'])
+
+    def test_compaction_rolls_old_logs_into_daily_summaries(self):
+        forty_days = 40 * 24 * 60
+        for _ in range(3):
+            self.log(forty_days)
+        recent = self.log(0)
+
+        self.assertEqual(compact_activity_logs(retention_days=30, batch_size=2), (3, 2))
+        self.assertEqual(list(ActivityLog.objects.all()), [recent])
+        self.assertEqual(ActivityLogSummary.objects.get().count, 3)
+
+        # A later run adds to the same day's summary
+        self.log(forty_days)
+        self.assertEqual(compact_activity_logs(retention_days=30), (1, 1))
+        self.assertEqual(ActivityLogSummary.objects.get().count, 4)
+
+
+class ActivityLogPolicyTests(TestCase):
+
+    def test_path_rule_takes_precedence_over_method(self):
+        policy = ActivityLogPolicy(
+            [('/check-availability/', 3), ('/import-jobs/', 'never')],
+            always_methods=['POST']
+        )
+        logged = [policy.should_log('/check-availability/', 'POST') for _ in range(6)]
+        self.assertEqual(logged.count(True), 2)
+        self.assertFalse(policy.should_log('/import-jobs/4/status/', 'GET'))
+
+    def test_unmatched_mutating_requests_are_always_logged(self):
+        policy = ActivityLogPolicy([], default='never', always_methods=['POST'])
+        self.assertTrue(policy.should_log('/create-booking/', 'POST'))
+        self.assertFalse(policy.should_log('/timeline/', 'GET'))
+
+
+class BackupScheduleTests(TestCase):
+
+    def test_due_backup_is_claimed_once(self):
+        claimed, next_due_at = claim_due_backup()
+        self.assertTrue(claimed)
+
+        claimed_again, due_at = claim_due_backup()
+        self.assertFalse(claimed_again)
+        self.assertEqual(due_at, next_due_at)
+
+    def test_run_due_within_grace_is_claimed(self):
+        claim_due_backup()
+        BackupSchedule.objects.update(next_due_at=timezone.now() + timedelta(seconds=30))
+        self.assertFalse(claim_due_backup()[0])
+        self.assertTrue(claim_due_backup(grace_seconds=60)[0])
+
+    def test_new_schedule_follows_last_differential(self):
+        now = timezone.now()
+        full = DataBackup.objects.create(backup_type='AUTO', file_name='auto.xlsx')
+        diff = DataBackup.objects.create(backup_type='DIFF', file_name='diff.xlsx', base_backup=full)
+        DataBackup.objects.filter(id=full.id).update(created_at=now - timedelta(minutes=30))
+        DataBackup.objects.filter(id=diff.id).update(created_at=now - timedelta(minutes=2))
+
+        claimed, next_due_at = claim_due_backup()
+        self.assertFalse(claimed)
+        self.assertEqual(next_due_at, now + timedelta(minutes=8))
+
+    def test_health_check_counts_reverified_backups(self):
+        backup = DataBackup.objects.create(backup_type='AUTO', file_name='auto.xlsx')
+        DataBackup.objects.filter(id=backup.id).update(created_at=timezone.now() - timedelta(hours=3))
+        self.assertFalse(backup_system_health_check()['success'])
+
+        # Data unchanged since: the old backup was checked again instead
+        DataBackup.objects.filter(id=backup.id).update(verified_at=timezone.now())
+        self.assertEqual(backup_system_health_check()['recent_backups'], 1)
+
+
+@skipUnless(EXCEL_AVAILABLE, 'Excel libraries not installed')
+class AutoBackupTests(BookingFixtureMixin, TestCase):
+
+    def test_unchanged_data_is_not_backed_up_again(self):
+        self.book(self.room, date(2025, 6, 1), date(2025, 6, 3))
+        first, created = create_auto_backup_if_changed()
+        self.assertTrue(created)
+        self.assertEqual(first.backup_type, 'AUTO')
+
+        again, created = create_auto_backup_if_changed()
+        self.assertFalse(created)
+        self.assertEqual(again.id, first.id)
+        self.assertIsNotNone(DataBackup.objects.get(id=first.id).verified_at)
+
+        self.book(self.other_room, date(2025, 6, 1), date(2025, 6, 3))
+        diff, created = create_auto_backup_if_changed()
+        self.assertTrue(created)
+        self.assertEqual((diff.backup_type, diff.base_backup_id), ('DIFF', first.id))
+
+    def test_restore_replays_base_and_differentials(self):
+        kept = self.book(self.room, date(2025, 6, 1), date(2025, 6, 3))
+        removed = self.book(self.other_room, date(2025, 6, 1), date(2025, 6, 3))
+        base, _ = create_auto_backup_if_changed()
+
+        kept.guest_name = 'Renamed'
+        kept.save()
+        removed.delete()
+        diff, _ = create_auto_backup_if_changed()
+
+        self.book(self.other_room, date(2025, 7, 1), date(2025, 7, 3))
+        later_diff, _ = create_auto_backup_if_changed()
+
+        self.assertEqual(get_restore_chain(diff), [base, diff])
+        self.assertEqual(get_restore_chain(later_diff), [base, diff, later_diff])
+
+        restore_backup(diff, self.user)
+        self.assertEqual(list(Booking.objects.values_list('id', 'guest_name')), [(kept.id, 'Renamed')])
+
+    def test_periodic_task_runs_only_when_claimed(self):
+        self.book(self.room, date(2025, 6, 1), date(2025, 6, 3))
+        self.assertEqual(create_automatic_backup()['file_name'], DataBackup.objects.get().file_name)
+
+        self.assertTrue(create_automatic_backup()['skipped'])
+        self.assertEqual(DataBackup.objects.count(), 1)
+
+
+class DifferentialBackupTests(TestCase):
+
+    def test_only_automatic_backups_are_diff_bases(self):
+        now = timezone.now()
+        auto = DataBackup.objects.create(backup_type='AUTO', file_name='auto.xlsx', data_as_of=now - timedelta(hours=1))
+        DataBackup.objects.create(backup_type='MANUAL', file_name='manual.xlsx', data_as_of=now)
+        self.assertEqual(get_last_full_backup(), auto)
+
+    def test_delete_refuses_base_with_differentials(self):
+        user = CustomUser.objects.create(username='admin', user_type='SUPER')
+        base = DataBackup.objects.create(backup_type='MANUAL', file_name='base.xlsx', data_as_of=timezone.now())
+        DataBackup.objects.create(backup_type='DIFF', file_name='diff.xlsx', base_backup=base)
+        self.client.force_login(user)
+
+        self.client.post(reverse('delete_backup', args=[base.id]))
+
+        self.assertEqual(DataBackup.objects.count(), 2)
+
+
+class BackupStorageTests(TestCase):
+
+    def use_backup_store(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        storage = override_settings(BACKUP_STORAGE={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': location},
+        })
+        storage.enable()
+        self.addCleanup(storage.disable)
+        backup_storage._store = None
+        self.addCleanup(setattr, backup_storage, '_store', None)
+
+    def test_files_stay_in_database_without_backup_storage(self):
+        with override_settings(BACKUP_STORAGE=None):
+            backup = create_backup_record('IMPORT', file_data=b'workbook')
+
+        backup = DataBackup.objects.get(id=backup.id)
+        self.assertEqual(backup.storage_key, '')
+        self.assertEqual(backup.file_size, 8)
+        self.assertEqual(backup.read_file(), b'workbook')
+
+    def test_database_file_is_read_in_slices(self):
+        with override_settings(BACKUP_STORAGE=None):
+            backup = create_backup_record('IMPORT', file_data=b'0123456789')
+
+        stored = DataBackup.objects.get(id=backup.id).open_file()
+        stored.seek(3)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(stored.read(4), b'3456')
+        self.assertIn('SUBSTR', queries[0]['sql'].upper())
+        self.assertEqual(stored.read(), b'789')
+        self.assertEqual(stored.read(), b'')
+
+    def test_identical_files_are_stored_separately(self):
+        self.use_backup_store()
+        first = create_backup_record('IMPORT', file_data=b'workbook')
+        second = create_backup_record('IMPORT', file_data=b'workbook')
+        self.assertNotEqual(first.storage_key, second.storage_key)
+        self.assertEqual(first.checksum, second.checksum)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        self.assertEqual(DataBackup.objects.get(id=second.id).read_file(), b'workbook')
+
+
+class ByteRangeTests(SimpleTestCase):
+
+    def test_parse_byte_range(self):
+        self.assertEqual(parse_byte_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_byte_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_byte_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_byte_range('bytes=990-2000', 1000), (990, 999))
+        # Whole file instead
+        for header in (None, 'bytes=0-1,5-9', 'bytes=abc', 'bytes=5-1', 'items=0-1'):
+            self.assertIsNone(parse_byte_range(header, 1000))
+
+    def test_range_past_the_end_is_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_byte_range('bytes=1000-', 1000)
+
+
+class BackupDownloadTests(BookingFixtureMixin, TestCase):
+
+    def setUp(self):
+        self.backup = create_backup_record('IMPORT', file_data=b'0123456789')
+        self.url = reverse('download_backup', args=[self.backup.id])
+        self.client.force_login(self.user)
+
+    def test_range_request_gets_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['X-Checksum-SHA256'], self.backup.checksum)
+
+    def test_range_for_another_file_version_gets_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outdated"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_range_past_the_end_gets_416(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+
+@skipUnless(EXCEL_AVAILABLE, 'Excel libraries not installed')
+class BookingImportTests(BookingFixtureMixin, TestCase):
+
+    def rows(self, **overrides):
+        df = pd.DataFrame([dict({
+            'Room Number': '101', 'Guest Name': 'Ana', 'Check In Date': '2025-05-01',
+            'Check Out Date': '2025-05-03', 'Total Amount': 1500,
+        }, **overrides)])
+        rows, errors = validate_booking_rows(df, {room.room_number: room for room in Room.objects.all()})
+        self.assertEqual(errors, [])
+        return rows
+
+    def test_validation_reports_first_problem_per_row(self):
+        df = pd.DataFrame([
+            {'Room Number': '101', 'Guest Name': 'Ana', 'Check In Date': '2025-05-01',
+             'Check Out Date': '2025-05-03', 'Total Amount': 1500},
+            {'Room Number': '999', 'Guest Name': '', 'Check In Date': '2025-05-01',
+             'Check Out Date': '2025-05-03', 'Total Amount': 1500},
+            {'Room Number': '102', 'Guest Name': 'Bo', 'Check In Date': '2025-05-03',
+             'Check Out Date': '2025-05-01', 'Total Amount': 'n/a'},
+        ])
+
+        rows, errors = validate_booking_rows(df, {room.room_number: room for room in Room.objects.all()})
+
+        self.assertEqual(errors, [
+            'Row 3: Room 999 not found',
+            'Row 4: Check-out date must be after check-in date',
+        ])
+        self.assertEqual(list(rows.index), [2])
+        self.assertEqual(rows.loc[2, 'room_id'], self.room.id)
+        self.assertEqual(rows.loc[2, 'check_in_date'], date(2025, 5, 1))
+
+    def test_write_updates_same_booking_and_publishes_bulk_change(self):
+        broadcaster = get_broadcaster()
+        cursor = broadcaster.events_after().cursor
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(write_booking_rows(self.rows(), self.user), (1, 0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(write_booking_rows(self.rows(**{'Total Amount': 1800}), self.user), (0, 1, 0))
+
+        self.assertEqual(Booking.objects.get().total_amount, Decimal('1800'))
+        events = broadcaster.events_after(cursor).events
+        self.assertEqual([(e['action'], e['count']) for e in events], [('bulk', 1), ('bulk', 1)])
+
+
+@skipUnless(EXCEL_AVAILABLE, 'Excel libraries not installed')
+class ImportJobTests(BookingFixtureMixin, TestCase):
+
+    def create_job(self, **fields):
+        return ImportJob.objects.create(created_by=self.user, file_name='bookings.xlsx', file_data=b'not a workbook', **fields)
+
+    def test_failed_import_creates_no_backup(self):
+        job = run_import_job(self.create_job().id)
+
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIsNone(job.backup)
+        self.assertFalse(DataBackup.objects.exists())
+        self.assertIsNone(ImportJob.objects.get(id=job.id).file_data)
+
+    def test_backup_takes_over_upload_without_loading_it(self):
+        with override_settings(BACKUP_STORAGE=None):
+            job = ImportJob.objects.create(
+                created_by=self.user, file_name='bookings.xlsx', **backup_storage.store_backup_file(b'upload')
+            )
+        job = ImportJob.objects.get(id=job.id)
+
+        backup = create_backup_record('IMPORT', stored_file=job)
+
+        self.assertIn('file_data', job.get_deferred_fields())
+        self.assertEqual(DataBackup.objects.get(id=backup.id).read_file(), b'upload')
+
+    def test_stale_jobs_are_failed(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        stale = self.create_job(status='RUNNING', heartbeat_at=long_ago)
+        alive = self.create_job(status='RUNNING', heartbeat_at=timezone.now())
+        lost = self.create_job()
+        ImportJob.objects.filter(id=lost.id).update(created_at=long_ago)
+
+        self.assertCountEqual(fail_stale_import_jobs(), [stale.id, lost.id])
+        self.assertEqual(ImportJob.objects.get(id=stale.id).status, 'FAILED')
+        self.assertEqual(ImportJob.objects.get(id=alive.id).status, 'RUNNING')
+
+    def test_imports_and_exports_use_separate_pools(self):
+        self.assertIsNot(get_job_executor('process_import_job'), get_job_executor('process_export_job'))
+
+
+class ExportJobTests(BookingFixtureMixin, TestCase):
+
+    def test_automatic_backup_is_not_served_as_export(self):
+        DataBackup.objects.create(backup_type='AUTO', file_name='auto.xlsx', data_fingerprint=get_data_fingerprint())
+
+        with mock.patch('rooms.export_jobs.dispatch_job'):
+            backup, job = request_export(self.user)
+
+        self.assertIsNone(backup)
+        self.assertIsNotNone(job)
+
+    def test_concurrent_request_joins_unfinished_job(self):
+        fingerprint = get_data_fingerprint()
+        existing = ExportJob.objects.create(created_by=self.user, data_fingerprint=fingerprint)
+
+        # As if the other request created its job after this one looked
+        unfinished = ExportJob.objects.filter(data_fingerprint=fingerprint, status__in=['PENDING', 'RUNNING'])
+        with mock.patch('rooms.export_jobs.ExportJob.objects.filter', side_effect=[ExportJob.objects.none(), unfinished]):
+            backup, job = request_export(self.user)
+
+        self.assertIsNone(backup)
+        self.assertEqual(job, existing)
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+    def test_job_failed_as_stale_keeps_its_outcome(self):
+        job = ExportJob.objects.create(created_by=self.user, data_fingerprint=get_data_fingerprint())
+        long_ago = timezone.now() - timedelta(hours=1)
+
+        def export_marked_stale(**kwargs):
+            ExportJob.objects.filter(id=job.id).update(heartbeat_at=long_ago)
+            kwargs['progress'](2000)
+            self.assertGreater(ExportJob.objects.get(id=job.id).heartbeat_at, long_ago)
+            ExportJob.objects.filter(id=job.id).update(status='FAILED', message='Export interrupted')
+            return DataBackup.objects.create(backup_type='MANUAL', file_name='export.xlsx')
+
+        with mock.patch('rooms.export_jobs.create_backup_record', side_effect=export_marked_stale):
+            finished = run_export_job(job.id)
+
+        self.assertEqual((finished.status, finished.message, finished.backup), ('FAILED', 'Export interrupted', None))
+
+
+class BackupRetentionTests(TestCase):
+
+    def backup(self, created_at, backup_type='AUTO', **fields):
+        backup = DataBackup.objects.create(backup_type=backup_type, file_name=f'{created_at}.xlsx', **fields)
+        DataBackup.objects.filter(id=backup.id).update(created_at=created_at)
+        return backup
+
+    def test_retention_keeps_one_backup_per_bucket(self):
+        local = timezone.get_current_timezone()
+        now = datetime(2025, 6, 1, 12, 30, tzinfo=local)
+        recent = [self.backup(now - timedelta(hours=hours)) for hours in (1, 2)]
+        same_hour = [self.backup(datetime(2025, 5, 29, 12, minute, tzinfo=local)) for minute in (5, 20)]
+        same_day = [self.backup(datetime(2025, 5, 2, hour, tzinfo=local)) for hour in (9, 15)]
+        expired = self.backup(datetime(2025, 1, 1, tzinfo=local))
+        self.backup(datetime(2025, 1, 1, tzinfo=local), backup_type='MANUAL')
+        # A kept differential keeps its base, whatever its age
+        self.backup(now - timedelta(hours=3), backup_type='DIFF', base_backup=same_day[0])
+
+        self.assertCountEqual(select_backups_to_delete(now), [same_hour[0].id, expired.id])
+        self.assertNotIn(recent[0].id, select_backups_to_delete(now))
+
+    def test_cleanup_never_loads_backup_files(self):
+        now = timezone.now()
+        expired = self.backup(now - timedelta(days=365), file_data=b'full')
+        self.backup(now - timedelta(days=365), backup_type='DIFF', base_backup=expired, file_data=b'diff')
+        self.backup(now - timedelta(hours=1))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cleanup_old_backups(now), 2)
+
+        self.assertEqual(DataBackup.objects.count(), 1)
+        for query in queries:
+            self.assertNotIn('file_data', query['sql'])
@@ -0,0 +1,176 @@
+from datetime import timedelta
+from django.db.models import Count, Q
+from .models import Room, RoomType, Booking
+
+# Selectable timeline lengths in days, as offered by the period selector
+TIMELINE_PERIODS = [
+    (14, '2 weeks'),
+    (30, '30 days'),
+    (90, '90 days'),
+    (365, '1 year'),
+]
+DEFAULT_TIMELINE_DAYS = 14
+
+# Longer windows are rendered client-side from row chunks (see build_timeline_rows)
+VIRTUALIZE_AFTER_DAYS = 30
+
+
+def get_period_days(value):
+    """Parse a requested period length, falling back to the default"""
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_TIMELINE_DAYS
+    return days if days in dict(TIMELINE_PERIODS) else DEFAULT_TIMELINE_DAYS
+
+
+def booking_entry(booking):
+    """Timeline representation of a booking"""
+    return {
+        'id': booking.id,
+        'guest_name': booking.guest_name,
+        'check_in': booking.check_in_date,
+        'check_out': booking.check_out_date,
+        'status': booking.status,
+        'payment_status': booking.payment_status,
+        'color': booking.get_display_color(),
+        'total_amount': booking.total_amount,
+        'paid_amount': booking.paid_amount,
+        'nights': booking.get_nights_count(),
+    }
+
+
+def window_bookings(start_date, end_date):
+    """Bookings with at least one night inside start_date..end_date"""
+    return Booking.objects.filter(
+        check_in_date__lte=end_date,
+        check_out_date__gt=start_date
+    ).order_by('check_in_date', 'id')
+
+
+def get_date_range(start_date, end_date):
+    """Every date from start_date to end_date inclusive"""
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+def layout_bar(booking, start_date, day_count):
+    """
+    Position a booking bar on the grid: the column it starts in, how many
+    night columns it spans, and whether it runs past either window edge.
+    """
+    first_night = (booking['check_in'] - start_date).days
+    after_last_night = (booking['check_out'] - start_date).days
+    offset = max(first_night, 0)
+
+    booking.update({
+        'offset': offset,
+        'span': min(after_last_night, day_count) - offset,
+        'clipped_start': first_night < 0,
+        'clipped_end': after_last_night > day_count,
+    })
+    return booking
+
+
+def layout_row(room_bookings, date_range):
+    """
+    Lay out one room row as a list of cells, one per date, each carrying the
+    bars that start in it, so the template renders the row in one pass.
+    """
+    cells = [{'date': day, 'bars': []} for day in date_range]
+    for booking in room_bookings:
+        layout_bar(booking, date_range[0], len(date_range))
+        if booking['span'] > 0:
+            cells[booking['offset']]['bars'].append(booking)
+    return cells
+
+
+def build_timeline(start_date, end_date):
+    """
+    Assemble the reservation timeline for start_date..end_date (inclusive).
+
+    Runs exactly three queries however many rooms and room types exist:
+    room types, active rooms, and the bookings touching the window. Rows are
+    then grouped in Python in a single pass over each result, and every row
+    gets a precomputed cell layout (see layout_row).
+    """
+    date_range = get_date_range(start_date, end_date)
+
+    room_types = list(RoomType.objects.order_by('display_order', 'name'))
+    rooms = list(Room.objects.filter(is_active=True).order_by('room_number'))
+
+    bookings = list(window_bookings(start_date, end_date))
+
+    bookings_by_room = {}
+    for booking in bookings:
+        bookings_by_room.setdefault(booking.room_id, []).append(booking_entry(booking))
+
+    rooms_by_type = {}
+    for room in rooms:
+        room_bookings = bookings_by_room.get(room.id, [])
+        rooms_by_type.setdefault(room.room_type_id, []).append({
+            'room': room,
+            'bookings': room_bookings,
+            'cells': layout_row(room_bookings, date_range),
+        })
+
+    # Room types without active rooms are left out, as before
+    timeline_data = []
+    for room_type in room_types:
+        if room_type.id in rooms_by_type:
+            timeline_data.append({
+                'room_type': room_type,
+                'rooms': rooms_by_type[room_type.id],
+            })
+
+    return {
+        'timeline_data': timeline_data,
+        'date_range': date_range,
+    }
+
+
+def build_timeline_groups():
+    """Room types that have active rooms, with their room counts, in one query"""
+    return list(
+        RoomType.objects.annotate(
+            room_count=Count('room', filter=Q(room__is_active=True))
+        ).filter(room_count__gt=0).order_by('display_order', 'name')
+    )
+
+
+def build_timeline_rows(start_date, end_date, room_type_id=None, offset=0, limit=None):
+    """
+    Build one chunk of timeline rows for the virtualized long-range view:
+    the active rooms of a room type (or a page of all rooms) with their
+    positioned bars. Two queries per chunk; no per-date cells are built, the
+    browser only draws the rows and columns in view.
+    """
+    rooms = Room.objects.filter(is_active=True).order_by('room_number')
+    if room_type_id:
+        rooms = rooms.filter(room_type_id=room_type_id)
+    rooms = list(rooms[offset:offset + limit] if limit else rooms[offset:])
+
+    bookings = window_bookings(start_date, end_date).filter(
+        room__in=[room.id for room in rooms]
+    ).only('id', 'room_id', 'guest_name', 'check_in_date', 'check_out_date', 'status', 'payment_status')
+
+    day_count = (end_date - start_date).days + 1
+    bars_by_room = {}
+    for booking in bookings:
+        bar = layout_bar({
+            'id': booking.id,
+            'guest_name': booking.guest_name,
+            'check_in': booking.check_in_date,
+            'check_out': booking.check_out_date,
+            'color': booking.get_display_color(),
+        }, start_date, day_count)
+        bars_by_room.setdefault(booking.room_id, []).append(bar)
+
+    return [
+        {
+            'id': room.id,
+            'room_number': room.room_number,
+            'bars': bars_by_room.get(room.id, []),
+        }
+        for room in rooms
+    ]
+
@@ -6,9 +6,15 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('timeline/', views.timeline_view, name='timeline'),
+    path('timeline/rows/', views.timeline_rows, name='timeline_rows'),
+    path('timeline/data/', views.timeline_data, name='timeline_data'),
+    path('timeline/events/', views.booking_events, name='booking_events'),
+    path('timeline/events/poll/', views.booking_events_poll, name='booking_events_poll'),
     path('create-booking/', views.create_booking, name='create_booking'),
     path('check-availability/', views.check_availability, name='check_availability'),
+    path('search-availability/', views.search_availability, name='search_availability'),
     path('booking/<int:booking_id>/', views.booking_detail, name='booking_detail'),
+    path('bookings/changes/', views.booking_changes, name='booking_changes'),
     path('manage-rates/', views.manage_rates, name='manage_rates'),
     path('system-memo/', views.system_memo, name='system_memo'),
     path('activity-log/', views.activity_log_view, name='activity_log'),
@@ -16,7 +22,9 @@ urlpatterns = [
     # Backup management URLs
     path('backup-management/', views.backup_management, name='backup_management'),
     path('export-data/', views.export_data, name='export_data'),
+    path('export-jobs/<int:job_id>/status/', views.export_job_status, name='export_job_status'),
     path('import-data/', views.import_data, name='import_data'),
+    path('import-jobs/<int:job_id>/status/', views.import_job_status, name='import_job_status'),
     path('manual-backup/', views.manual_backup, name='manual_backup'),
     path('trigger-auto-backup/', views.trigger_auto_backup, name='trigger_auto_backup'),
     path('download-backup/<int:backup_id>/', views.download_backup, name='download_backup'),
@@ -1,18 +1,39 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import require_http_methods, condition
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.db.models import Q
 from datetime import datetime, timedelta, date
+import base64
 import json
+from urllib.parse import urlencode
+import time
 from decimal import Decimal
 
-from .models import Room, RoomType, Booking, CustomUser, SystemMemo, ActivityLog, DataBackup
-from .backup_utils import export_bookings_to_excel, import_bookings_from_excel, create_backup_record
+from .models import Room, RoomType, Booking, CustomUser, SystemMemo, ActivityLog, DataBackup, ImportJob, ExportJob
+from .activity_log import filter_activity_logs, page_activity_logs
+from .availability import find_conflicting_bookings, find_available_rooms
+from .data_version import get_data_version
+from .change_feed import get_broadcaster, parse_cursors
+from .booking_changes import get_booking_changes, DEFAULT_CHANGES_LIMIT
+from .timeline import (
+    TIMELINE_PERIODS, VIRTUALIZE_AFTER_DAYS, get_period_days,
+    build_timeline, build_timeline_groups, build_timeline_rows,
+)
+from .stats import booking_window_stats
+from .backup_utils import (
+    create_backup_record, iter_file_chunks, parse_byte_range,
+)
+from .import_jobs import start_import_job, fail_stale_import_jobs
+from .export_jobs import request_export, fail_stale_export_jobs
 from .timezone_utils import now_in_philippines, format_philippine_time, get_philippine_time_display
 
 def is_admin_or_super(user):
@@ -67,6 +88,7 @@ def dashboard(request):
         'user': request.user,
         'start_date': start_date,
         'end_date': end_date,
+        'stats': booking_window_stats(start_date, end_date),
     }
     
     return render(request, 'rooms/dashboard.html', context)
@@ -81,86 +103,201 @@ def timeline_view(request):
         today = timezone.now().date()
         start_date = today - timedelta(days=today.weekday())
     
-    end_date = start_date + timedelta(days=13)
-    
-    # Get all rooms grouped by room type
-    room_types = RoomType.objects.all().order_by('display_order', 'name')
-    
-    # Get bookings for the timeline
-    bookings = Booking.objects.filter(
-        Q(check_in_date__lte=end_date) & Q(check_out_date__gte=start_date)
-    ).select_related('room', 'room__room_type').order_by('check_in_date')
-    
-    # Create timeline data grouped by room type
-    timeline_data = []
-    
-    for room_type in room_types:
-        rooms = Room.objects.filter(
-            is_active=True, 
-            room_type=room_type
-        ).order_by('room_number')
-        
-        if rooms.exists():
-            room_type_data = {
-                'room_type': room_type,
-                'rooms': []
-            }
-            
-            for room in rooms:
-                room_bookings = bookings.filter(room=room)
-                room_data = {
-                    'room': room,
-                    'bookings': []
-                }
-                
-                for booking in room_bookings:
-                    room_data['bookings'].append({
-                        'id': booking.id,
-                        'guest_name': booking.guest_name,
-                        'check_in': booking.check_in_date,
-                        'check_out': booking.check_out_date,
-                        'status': booking.status,
-                        'payment_status': booking.payment_status,
-                        'color': booking.get_display_color(),
-                        'total_amount': booking.total_amount,
-                        'paid_amount': booking.paid_amount,
-                        'nights': booking.get_nights_count(),
-                    })
-                
-                room_type_data['rooms'].append(room_data)
-            
-            timeline_data.append(room_type_data)
-    
-    # Generate date range for header
-    date_range = []
-    current_date = start_date
-    while current_date <= end_date:
-        date_range.append(current_date)
-        current_date += timedelta(days=1)
-    
-    # Count stats
-    total_bookings = bookings.count()
-    total_rooms = Room.objects.filter(is_active=True).count()
-    occupied_rooms = bookings.values('room').distinct().count()
-    occupancy_rate = round((occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0, 1)
-    total_revenue = sum(b.total_amount for b in bookings)
+    days = get_period_days(request.GET.get('days'))
+    end_date = start_date + timedelta(days=days - 1)
     
     context = {
-        'timeline_data': timeline_data,
-        'date_range': date_range,
         'start_date': start_date,
         'end_date': end_date,
-        'prev_week': start_date - timedelta(days=14),
-        'next_week': start_date + timedelta(days=14),
-        'stats': {
-            'total_bookings': total_bookings,
-            'occupancy_rate': occupancy_rate,
-            'total_revenue': total_revenue,
-        }
+        'days': days,
+        'data_version': get_data_version().version,
+        'feed_since': time.time(),
+        'change_feed_sse': isinstance(request, ASGIRequest),
+        'period_label': dict(TIMELINE_PERIODS)[days],
+        'periods': TIMELINE_PERIODS,
+        'prev_start': start_date - timedelta(days=days),
+        'next_start': start_date + timedelta(days=days),
     }
     
+    if days > VIRTUALIZE_AFTER_DAYS:
+        # Long windows: only the group outline is rendered here, rows are
+        # fetched per room type from timeline_rows and drawn as they scroll in
+        groups = build_timeline_groups()
+        context.update({
+            'virtualized': True,
+            'groups': [
+                {'id': group.id, 'name': group.name, 'label': group.get_name_display(), 'room_count': group.room_count}
+                for group in groups
+            ],
+        })
+    else:
+        # Rooms, room types and window bookings in a fixed three queries
+        timeline = build_timeline(start_date, end_date)
+        context.update({
+            'timeline_data': timeline['timeline_data'],
+            'date_range': timeline['date_range'],
+        })
+    
+    context['stats'] = booking_window_stats(start_date, end_date)
+    
     return render(request, 'rooms/timeline.html', context)
 
+def _request_data_version(request):
+    """Look up the data version once per request for both ETag and Last-Modified"""
+    if not hasattr(request, '_data_version'):
+        request._data_version = get_data_version()
+    return request._data_version
+
+def _timeline_etag(request):
+    data_version = _request_data_version(request)
+    return (
+        f"timeline-{data_version.version}-{request.GET.get('start_date', '')}-{request.GET.get('days', '')}"
+        f"-{request.GET.get('only', '')}"
+    )
+
+def _timeline_last_modified(request):
+    return _request_data_version(request).updated_at
+
+@login_required
+@condition(etag_func=_timeline_etag, last_modified_func=_timeline_last_modified)
+def timeline_data(request):
+    """
+    Compact JSON timeline for auto-refresh. Answers 304 Not Modified when the
+    data version hasn't moved, so an unchanged refresh costs one lookup.
+    ?only=version skips the rows and stats (the grid page reloads itself when
+    the version moves), ?only=stats skips the rows (the long-range view
+    fetches them per room type as they scroll into view).
+    """
+    try:
+        start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
+        days = get_period_days(request.GET.get('days'))
+        end_date = start_date + timedelta(days=days - 1)
+        only = request.GET.get('only')
+        
+        data = {
+            'success': True,
+            'version': _request_data_version(request).version,
+            'start_date': start_date,
+            'days': days,
+        }
+        if only != 'version':
+            data['stats'] = booking_window_stats(start_date, end_date)
+        if not only:
+            data['rows'] = build_timeline_rows(start_date, end_date)
+        return JsonResponse(data)
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+def _feed_start(request):
+    """Resume point of a change feed client: its cursor on this stream, or the page render time"""
+    broadcaster = get_broadcaster()
+    cursor = parse_cursors(request.GET.get('cursors'), broadcaster.stream_id)
+    since = float(request.GET['since']) if cursor is None and request.GET.get('since') else None
+    return broadcaster, cursor, since
+
+async def booking_events(request):
+    """
+    Server-sent events stream of booking deltas. Only served under ASGI
+    (hotel_pms.asgi); WSGI deployments use booking_events_poll instead.
+    """
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'success': False, 'error': 'Event stream requires ASGI, use long-polling'}, status=400)
+    
+    broadcaster, cursor, since = _feed_start(request)
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    if last_event_id:
+        cursor = parse_cursors(last_event_id, broadcaster.stream_id)
+    keepalive = getattr(settings, 'CHANGE_FEED_KEEPALIVE', 15)
+    
+    async def stream():
+        nonlocal cursor, since
+        yield 'retry: 5000\n\n'
+        while True:
+            result = await broadcaster.listen(cursor, since, timeout=keepalive)
+            cursor, since = result.cursor, None
+            
+            if result.reset:
+                yield 'event: reset\ndata: {}\n\n'
+            for event in result.events:
+                yield f"id: {broadcaster.stream_id}:{event['seq']}\nevent: booking\ndata: {json.dumps(event)}\n\n"
+            if not result.events and not result.reset:
+                yield ': keepalive\n\n'
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+def booking_events_poll(request):
+    """Long-poll fallback of the booking change feed for WSGI deployments"""
+    try:
+        broadcaster, cursor, since = _feed_start(request)
+        wait = min(int(request.GET.get('wait', 0)), getattr(settings, 'CHANGE_FEED_POLL_WAIT', 0))
+        result = broadcaster.wait(cursor, since, timeout=max(wait, 0))
+        
+        return JsonResponse({
+            'success': True,
+            'stream': broadcaster.stream_id,
+            'cursor': result.cursor,
+            'reset': result.reset,
+            'events': result.events,
+            'wait': getattr(settings, 'CHANGE_FEED_POLL_WAIT', 0),
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@login_required
+def booking_changes(request):
+    """
+    Bookings created, updated or deleted since a cursor, for incremental sync.
+    Start with ?since=<ISO datetime> (or nothing for full history), then pass
+    back the returned cursor until has_more is false.
+    """
+    try:
+        since = None
+        if request.GET.get('since'):
+            since = datetime.fromisoformat(request.GET['since'])
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        
+        changes = get_booking_changes(
+            cursor=request.GET.get('cursor'),
+            since=since,
+            limit=request.GET.get('limit', DEFAULT_CHANGES_LIMIT)
+        )
+        return JsonResponse(dict(changes, success=True))
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+@login_required
+def timeline_rows(request):
+    """JSON chunk of timeline rows (one room type, or a page of rooms) for long-range views"""
+    try:
+        start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
+        days = get_period_days(request.GET.get('days'))
+        end_date = start_date + timedelta(days=days - 1)
+        offset = int(request.GET.get('offset', 0))
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+        
+        rows = build_timeline_rows(start_date, end_date, request.GET.get('room_type'), offset, limit)
+        
+        return JsonResponse({
+            'success': True,
+            'start_date': start_date,
+            'days': days,
+            'rows': rows,
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
 @login_required
 def create_booking(request):
     if request.method == 'POST':
@@ -249,7 +386,9 @@ def check_availability(request):
                 return JsonResponse({'success': False, 'error': 'Invalid date range'})
             
             room = get_object_or_404(Room, id=room_id)
-            conflicting_bookings = Booking.check_room_availability(room, check_in_date, check_out_date)
+            # Answered from the in-memory interval index; create_booking
+            # re-checks against the database before saving
+            conflicting_bookings = find_conflicting_bookings(room, check_in_date, check_out_date)
             
             if conflicting_bookings:
                 conflicts = []
@@ -279,6 +418,41 @@ def check_availability(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
+@login_required
+def search_availability(request):
+    """AJAX endpoint returning every free room for given dates, optionally by room type"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            check_in_date = datetime.strptime(data.get('check_in_date'), '%Y-%m-%d').date()
+            check_out_date = datetime.strptime(data.get('check_out_date'), '%Y-%m-%d').date()
+            room_type_id = data.get('room_type_id')
+            
+            if check_in_date >= check_out_date:
+                return JsonResponse({'success': False, 'error': 'Invalid date range'})
+            
+            room_type = get_object_or_404(RoomType, id=room_type_id) if room_type_id else None
+            available_rooms = find_available_rooms(check_in_date, check_out_date, room_type)
+            
+            rooms = []
+            for room in available_rooms:
+                rooms.append({
+                    'id': room.id,
+                    'room_number': room.room_number,
+                    'room_type': room.room_type.get_name_display(),
+                })
+            
+            return JsonResponse({
+                'success': True,
+                'rooms': rooms,
+                'count': len(rooms)
+            })
+            
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+    
+    return JsonResponse({'success': False, 'error': 'Invalid request method'})
+
 @login_required
 @user_passes_test(is_admin_or_super)
 def booking_detail(request, booking_id):
@@ -367,14 +541,29 @@ def system_memo(request):
 @login_required
 @user_passes_test(is_super_user)
 def activity_log_view(request):
-    log_list = ActivityLog.objects.all()
-    paginator = Paginator(log_list, 25)  # Show 25 logs per page.
-
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    filters = {
+        key: request.GET.get(key, '').strip()
+        for key in ['user', 'method', 'path', 'date_from', 'date_to']
+    }
+    
+    try:
+        logs = filter_activity_logs(filters)
+        page = page_activity_logs(logs, before=request.GET.get('before'), after=request.GET.get('after'))
+    except ValueError as e:
+        messages.error(request, str(e))
+        page = page_activity_logs(ActivityLog.objects.none())
+    
+    # Filters carried over by the Newer/Older links
+    filter_query = urlencode({key: value for key, value in filters.items() if value})
 
     context = {
-        'page_obj': page_obj,
+        'logs': page['logs'],
+        'newer_cursor': page['newer_cursor'],
+        'older_cursor': page['older_cursor'],
+        'filters': filters,
+        'filter_query': filter_query,
+        'users': CustomUser.objects.order_by('username').only('id', 'username'),
+        'methods': ['GET', 'POST', 'PUT', 'PATCH', 'DELETE'],
     }
     return render(request, 'rooms/activity_log.html', context)
 
@@ -382,18 +571,25 @@ def activity_log_view(request):
 @user_passes_test(is_super_user)
 def backup_management(request):
     """View for managing backups - list, export, import"""
-    # Get all backups ordered by creation time
-    backup_list = DataBackup.objects.all().order_by('-created_at')
+    # Get all backups ordered by creation time, loading only the listed columns
+    backup_list = DataBackup.objects.for_listing().order_by('-created_at')
     paginator = Paginator(backup_list, 20)  # Show 20 backups per page
     
     page_number = request.GET.get('page')
     backups = paginator.get_page(page_number)
     
+    # Export being generated for this user, if they were sent here to wait for it
+    export_job_id = request.GET.get('export_job', '')
+    export_job = ExportJob.objects.filter(id=export_job_id).first() if export_job_id.isdigit() else None
+    
+    counts = DataBackup.objects.type_counts()
     context = {
         'backups': backups,
-        'total_backups': DataBackup.objects.count(),
-        'auto_backups': DataBackup.objects.filter(backup_type='AUTO').count(),
-        'manual_backups': DataBackup.objects.filter(backup_type='MANUAL').count(),
+        'total_backups': counts['total'],
+        'auto_backups': counts['auto'],
+        'manual_backups': counts['manual'],
+        'import_jobs': ImportJob.objects.select_related('created_by').defer('file_data')[:5],
+        'export_job': export_job,
     }
     
     return render(request, 'rooms/backup_management.html', context)
@@ -403,30 +599,36 @@ def backup_management(request):
 def export_data(request):
     """Export current data to Excel format"""
     try:
-        # Create manual backup record
-        backup = create_backup_record(
-            backup_type='MANUAL',
-            user=request.user,
-            notes=f'Manual export by {request.user.username}'
-        )
+        backup, job = request_export(request.user)
         
-        # Generate Excel file
-        excel_buffer = export_bookings_to_excel()
+        if backup is not None:
+            # Nothing changed since this backup was taken: it is the export
+            return redirect('download_backup', backup_id=backup.id)
         
-        # Create HTTP response with Excel file
-        response = HttpResponse(
-            excel_buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{backup.file_name}"'
-        
-        messages.success(request, f'Data exported successfully. Backup record created: {backup.file_name}')
-        return response
+        # Generated in the background; the page downloads it when ready
+        messages.info(request, 'Export started. The download will begin when it is ready.')
+        return redirect(f"{reverse('backup_management')}?{urlencode({'export_job': job.id})}")
         
     except Exception as e:
         messages.error(request, f'Error exporting data: {str(e)}')
         return redirect('backup_management')
 
+@login_required
+@user_passes_test(is_super_user)
+def export_job_status(request, job_id):
+    """State of an export job, polled by the backup management page"""
+    job = get_object_or_404(ExportJob, id=job_id)
+    if not job.is_finished() and fail_stale_export_jobs(ExportJob.objects.filter(id=job.id)):
+        job.refresh_from_db()
+    return JsonResponse({
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished(),
+        'message': job.message,
+        'download_url': reverse('download_backup', args=[job.backup_id]) if job.backup_id else None,
+    })
+
 @login_required
 @user_passes_test(is_super_user)
 def import_data(request):
@@ -443,28 +645,9 @@ def import_data(request):
             return redirect('backup_management')
         
         try:
-            # Import the data
-            result = import_bookings_from_excel(excel_file, request.user)
-            
-            # Create import backup record
-            excel_file.seek(0)  # Reset file pointer
-            file_data = excel_file.read()
-            
-            backup = create_backup_record(
-                backup_type='IMPORT',
-                user=request.user,
-                file_data=file_data,
-                notes=f'Data import by {request.user.username}: {result["message"]}'
-            )
-            
-            if result['success']:
-                messages.success(request, result['message'])
-            else:
-                messages.warning(request, result['message'])
-                if 'errors' in result:
-                    for error in result['errors'][:5]:  # Show first 5 errors
-                        messages.error(request, error)
-            
+            # The import runs in the background; the page polls its progress
+            job = start_import_job(excel_file, request.user)
+            messages.info(request, f'Import of {job.file_name} started. Progress is shown below.')
             return redirect('backup_management')
             
         except Exception as e:
@@ -473,18 +656,73 @@ def import_data(request):
     
     return redirect('backup_management')
 
+@login_required
+@user_passes_test(is_super_user)
+def import_job_status(request, job_id):
+    """Progress of an import job, polled by the backup management page"""
+    job = get_object_or_404(ImportJob.objects.defer('file_data'), id=job_id)
+    if not job.is_finished() and fail_stale_import_jobs(ImportJob.objects.filter(id=job.id)):
+        job.refresh_from_db()
+    return JsonResponse({
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished(),
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'progress_percent': job.get_progress_percent(),
+        'created_count': job.created_count,
+        'updated_count': job.updated_count,
+        'error_count': job.error_count,
+        'message': job.message,
+    })
+
 @login_required
 @user_passes_test(is_super_user)
 def download_backup(request, backup_id):
     """Download a specific backup file"""
     try:
         backup = get_object_or_404(DataBackup, id=backup_id)
+        etag = f'"{backup.checksum}"'
+        
+        # Resume a partial download only if the file is still the same one
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range and if_range != etag:
+            range_header = None
+        
+        try:
+            byte_range = parse_byte_range(range_header, backup.file_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{backup.file_size}'
+            return response
+        
+        # Stream the file in chunks instead of building the response in memory
+        backup_file = backup.open_file()
+        if byte_range:
+            start, end = byte_range
+            backup_file.seek(start)
+            response = StreamingHttpResponse(
+                iter_file_chunks(backup_file, length=end - start + 1),
+                status=206,
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{backup.file_size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = StreamingHttpResponse(
+                iter_file_chunks(backup_file),
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+            response['Content-Length'] = str(backup.file_size)
         
-        response = HttpResponse(
-            backup.file_data,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
         response['Content-Disposition'] = f'attachment; filename="{backup.file_name}"'
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        # SHA-256 of the whole file, for verifying the download
+        response['X-Checksum-SHA256'] = backup.checksum
+        response['Digest'] = 'sha-256=' + base64.b64encode(bytes.fromhex(backup.checksum)).decode()
         
         return response
         
@@ -500,6 +738,16 @@ def delete_backup(request, backup_id):
         try:
             backup = get_object_or_404(DataBackup, id=backup_id)
             backup_name = backup.file_name
+            
+            # Deleting a base would take its differential backups with it
+            differential_count = backup.differentials.count()
+            if differential_count:
+                messages.error(
+                    request,
+                    f'Backup {backup_name} cannot be deleted: {differential_count} differential backups are based on it'
+                )
+                return redirect('backup_management')
+            
             backup.delete()
             
             messages.success(request, f'Backup {backup_name} deleted successfully')